@@ -1,7 +1,7 @@
 from fastapi import FastAPI, Request, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
 import logging
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from pydantic import BaseModel
 from typing import List, Dict, Optional
 import re
@@ -25,6 +25,16 @@ import asyncio
 from tqdm import tqdm
 import importlib.metadata
 import time
+import contextvars
+from contextlib import asynccontextmanager
+from burst_detection import BurstDetector, normalize_product_name
+from log_config import configure_logging, get_stage_logger, PayloadPreview, should_log_payload, truncate
+import schema
+import metrics
+from metrics import stage_timer
+from singleflight import SingleFlight, request_key
+from scheduler import BACKGROUND, INTERACTIVE, ClientDisconnected, SchedulerFull, SerialRunner, WorkScheduler, run_until_disconnected
+from prompt_builder import compact_scores, dedupe_evidence, estimate_tokens, format_review_lines, pack_reviews, record_prompt_usage
 # from adam import agent_executor
 
 model = SentenceTransformer("all-MiniLM-L6-v2")
@@ -43,6 +53,21 @@ GENERIC_COMMENT_LENGTH = 40
 GENERIC_COMMENT_PRODUCT_THRESHOLD = 3
 HIGH_AVG_RATING = 5.0
 HIGH_AVG_RATING_COUNT = 5
+COORDINATED_BURST_USER_COUNT = int(os.getenv("COORDINATED_BURST_USER_COUNT", 5))  # minimum distinct users
+COORDINATED_BURST_RATE_MULTIPLIER = float(os.getenv("COORDINATED_BURST_RATE_MULTIPLIER", 3.0))  # times the product's normal rate
+COORDINATED_BURST_INTERVAL = "10 minutes"
+BURST_HISTORY_LIMIT = 5000
+ANALYZE_BATCH_SIZE = 6
+ANALYZE_CACHE_TTL_SECONDS = 300
+ANALYZE_CACHE_MAX_ENTRIES = 1000
+LLM_WORKERS = int(os.getenv("LLM_WORKERS", 2))
+INTERACTIVE_QUEUE_DEPTH = 32
+BACKGROUND_QUEUE_DEPTH = 64
+DISCONNECT_POLL_SECONDS = 0.5
+CLIENT_CLOSED_REQUEST = 499
+# Characters stripped from stored comments, shared by ingest (Python) and cleaning (PostgreSQL regex)
+COMMENT_NEWLINE_PATTERN = r"[\n\r]"
+COMMENT_DISALLOWED_PATTERN = r"[^\u0000-\u007F\u4E00-\u9FFF\u3400-\u4DBF\u2000-\u206F\u3000-\u303F\uFF00-\uFFEF]"  # emojis; Chinese is kept
 
 
 DB_CONFIG = {
@@ -53,19 +78,28 @@ DB_CONFIG = {
     "port": int(os.getenv("PORT", 5432))
 }
 table_name = os.getenv("TABLE_NAME")
+review_table_partitioned = False
 llm_model = os.getenv("LLM_MODEL")
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434/api/generate")
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
+configure_logging()
 logger = logging.getLogger(__name__)
+ingest_logger = get_stage_logger("ingest")
+analyze_logger = get_stage_logger("analyze")
+llm_logger = get_stage_logger("llm")
+semantic_logger = get_stage_logger("semantic")
+behavioral_logger = get_stage_logger("behavioral")
+db_logger = get_stage_logger("db")
+cleaning_logger = get_stage_logger("cleaning")
 
 # Log critical configuration at startup
-logger.info(f"Database table name configured: {table_name}")
-logger.info(f"LLM model configured: {llm_model}")
+logger.info("Database table name configured: %s", table_name)
+logger.info("LLM model configured: %s", llm_model)
 if not table_name:
     logger.error("TABLE_NAME environment variable is not set!")
 else:
-    logger.info(f"TABLE_NAME environment variable is properly set to: {table_name}")
+    logger.info("TABLE_NAME environment variable is properly set to: %s", table_name)
 
 
 # Create data models
@@ -81,8 +115,16 @@ class Query(BaseModel):
     text: str
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Prepare the review table layout and indexes before serving requests; stop LLM workers on shutdown"""
+    prepare_review_storage(table_name)
+    yield
+    await llm_scheduler.stop()
+
+
 # Create FastAPI application
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 
 # Add custom middleware to add CORS headers to every response
@@ -95,6 +137,26 @@ async def add_cors_headers(request: Request, call_next):
     response.headers["Access-Control-Allow-Headers"] = "*"
     return response
 
+@app.middleware("http")
+async def trace_and_time_requests(request: Request, call_next):
+    """Propagate a trace ID through the request and record per-route latency"""
+    token = metrics.set_trace_id(request.headers.get(metrics.TRACE_HEADER))
+    trace_id = metrics.get_trace_id()
+    metrics.REQUESTS_IN_FLIGHT.inc()
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        response.headers[metrics.TRACE_HEADER] = trace_id
+        return response
+    finally:
+        metrics.REQUESTS_IN_FLIGHT.dec()
+        route = request.scope.get("route")
+        path = getattr(route, "path", "unmatched")
+        metrics.REQUEST_DURATION.observe(time.perf_counter() - start, method=request.method, path=path, status=status)
+        metrics.reset_trace_id(token)
+
 # Also keep the CORS middleware for standard handling
 app.add_middleware(
     CORSMiddleware,
@@ -105,13 +167,19 @@ app.add_middleware(
 )
 @app.post("/embed")
 async def embed(query: Query):
-    embedding = model.encode(query.text).tolist()
+    with stage_timer("encode"):
+        embedding = model.encode(query.text).tolist()
     return {"embedding": embedding}
 
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus text exposition of stage timers, request latency and cache gauges"""
+    return Response(content=metrics.render_metrics(), media_type=metrics.PROMETHEUS_CONTENT_TYPE)
+
 @app.get("/")
 async def root():
     """Root endpoint to verify API is running"""
-    logger.info("Root endpoint called")
+    logger.debug("Root endpoint called")
     response = JSONResponse({"status": "API is running"})
     response.headers["Access-Control-Allow-Origin"] = "*"
     return response
@@ -119,20 +187,20 @@ async def root():
 @app.post("/comments")
 async def process_comments(data: CommentData):
     """Store comments from Shopee in PostgreSQL database"""
-    logger.info(f"Received {len(data.comments)} comments")
+    ingest_logger.info("Received %d comments", len(data.comments))
     
     # Extract Gemini API key from request
     gemini_api_key = data.gemini_api_key
     # Log receipt without exposing the actual key
     if gemini_api_key:
         masked_key = gemini_api_key[:4] + "****" + gemini_api_key[-4:] if len(gemini_api_key) > 8 else "****"
-        logger.info(f"Gemini API key received: Yes (masked: {masked_key})")
+        ingest_logger.info("Gemini API key received: Yes (masked: %s)", masked_key)
     else:
-        logger.warning("No Gemini API key provided in request")
+        ingest_logger.info("No Gemini API key provided in request")
     
     # Only store metadata if provided, without Gemini processing
     if data.metadata and len(data.metadata) > 0:
-        logger.info(f"Storing {len(data.metadata)} comments in database")
+        ingest_logger.info("Storing %d comments in database", len(data.metadata))
         try:
             conn = get_db_connection()
             cursor = conn.cursor()
@@ -145,11 +213,11 @@ async def process_comments(data: CommentData):
                 clean_ts = clean_timestamp(raw_timestamp)
                 
                 insert_values.append((
-                    item.get('comment'), 
+                    clean_comment_text(item.get('comment')), 
                     item.get('username'), 
                     item.get('rating'), 
                     item.get('source'), 
-                    item.get('product'), 
+                    normalize_product_name(item.get('product')),  # same key burst lookups use
                     clean_ts  # Use cleaned timestamp
                 ))
             
@@ -158,48 +226,70 @@ async def process_comments(data: CommentData):
             valid_values = [row for row in insert_values if row[5] is not None]
             
             if not valid_values:
-                logger.warning("No valid timestamps found in any comments, skipping database insertion")
+                ingest_logger.warning("No valid timestamps found in any comments, skipping database insertion")
                 return {
                     "message": "No valid timestamps found in comments, nothing stored", 
                     "total_stored": 0
                 }
             
-            cursor.executemany(
-                """
-                INSERT INTO product_reviews (comment, username, rating, source, product, page_timestamp)
-                VALUES (%s, %s, %s, %s, %s, %s)
-                ON CONFLICT DO NOTHING
-                """, 
-                valid_values
-            )
+            if not review_table_partitioned:
+                # `schema.py migrate` may have swapped in a partitioned table while this process was running
+                refresh_review_table_layout(cursor)
+            if review_table_partitioned:
+                try:
+                    ensured = schema.ensure_partitions(cursor, table_name, [row[5] for row in valid_values])
+                    schema.commit_partitions(conn, ensured)
+                except Exception as e:
+                    ingest_logger.error("Error creating partitions, rows will land in the default partition until a later request creates them: %s", e)
+                    conn.rollback()
             
-            conn.commit()
+            with stage_timer("db_insert"):
+                cursor.executemany(
+                    """
+                    INSERT INTO product_reviews (comment, username, rating, source, product, page_timestamp)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                    ON CONFLICT DO NOTHING
+                    """, 
+                    valid_values
+                )
+                
+                conn.commit()
             cursor.close()
             conn.close()
-            logger.info(f"Successfully stored {len(insert_values)} comments in database")
+            ingest_logger.info("Successfully stored %d comments in database", len(insert_values))
+            recorded = burst_detector.record_reviews(valid_values)
+            ingest_logger.debug("Recorded %d reviews in burst detection windows", recorded)
             try:
-                clean_postgresql_data(table_name)
-                logger.info("clean_postgresql_data called after storing data")
+                # One table-wide pass at a time on its own thread; concurrent ingests share the next pass
+                with stage_timer("cleaning"):
+                    await cleaning_runner.run(clean_postgresql_data, table_name)
+                ingest_logger.debug("clean_postgresql_data called after storing data")
             except Exception as e:
-                logger.error(f"Error calling clean_postgresql_data: {str(e)}")
+                ingest_logger.error("Error calling clean_postgresql_data: %s", e)
                 
             # If gemini_api_key is provided, analyze comments in background
+            analysis_scheduled = False
             if gemini_api_key:
-                logger.info("Gemini API key provided, scheduling background analysis")
-                # Create a background task for analysis (you can use FastAPI background tasks here)
-                asyncio.create_task(analyze_comments_batch_ollama(
-                    comments=data.comments, 
-                    product=data.product, 
-                    gemini_api_key=gemini_api_key
-                ))
+                ingest_logger.info("Gemini API key provided, scheduling background analysis")
+                # Background lane: yields to interactive /analyze calls and is bounded
+                try:
+                    job = await llm_scheduler.submit(BACKGROUND, lambda: analyze_comments_batch_ollama(
+                        comments=data.comments, 
+                        product=data.product, 
+                        gemini_api_key=gemini_api_key
+                    ))
+                    job.add_done_callback(log_background_analysis_failure)
+                    analysis_scheduled = True
+                except SchedulerFull as e:
+                    ingest_logger.warning("Background analysis queue full, skipping analysis (retry after %ds)", e.retry_after)
                 
             return {
                 "message": f"Successfully stored {len(insert_values)} comments in database", 
                 "total_stored": len(insert_values),
-                "analysis_scheduled": bool(gemini_api_key)
+                "analysis_scheduled": analysis_scheduled
             }
         except Exception as e:
-            logger.error(f"Database error storing comments: {str(e)}")
+            ingest_logger.error("Database error storing comments: %s", e)
             return JSONResponse(
                 status_code=500,
                 content={"message": f"Database error: {str(e)}"}
@@ -211,13 +301,18 @@ async def process_comments(data: CommentData):
         }
 
 
+def log_background_analysis_failure(job: asyncio.Future):
+    if not job.cancelled() and job.exception() is not None:
+        ingest_logger.error("Background analysis failed: %s", job.exception())
+
+
 @app.post("/analyze")
-async def analyze_comments(data: CommentData):
+async def analyze_comments(data: CommentData, request: Request = None):
     start_time = time.time()
-    logger.info(f"Received {len(data.comments)} comments for analysis")
+    analyze_logger.info("Received %d comments for analysis", len(data.comments))
     
     # Extract request parameters but don't log sensitive data
-    comments_to_process = data.comments[:6]
+    comments_to_process = data.comments[:ANALYZE_BATCH_SIZE]
     prompt = data.prompt
     product = data.product
     gemini_api_key = data.gemini_api_key
@@ -225,22 +320,75 @@ async def analyze_comments(data: CommentData):
     # Mask API key in logs
     if gemini_api_key:
         masked_key = gemini_api_key[:4] + "****" + gemini_api_key[-4:] if len(gemini_api_key) > 8 else "****"
-        logger.info(f"Gemini API key for analysis: Yes (masked: {masked_key})")
+        analyze_logger.info("Gemini API key for analysis: Yes (masked: %s)", masked_key)
     else:
-        logger.info("No Gemini API key provided for analysis")
+        analyze_logger.info("No Gemini API key provided for analysis")
         
     # Extract usernames if available
-    usernames = [item.get("username") if isinstance(item, dict) else None for item in getattr(data, "metadata", [])[:6]] if data.metadata else [None]*len(comments_to_process)
-    logger.info(f"Extracted usernames: {usernames}")
-    logger.info(f"Batch analyzing {len(comments_to_process)} comments")
+    usernames = [item.get("username") if isinstance(item, dict) else None for item in getattr(data, "metadata", [])[:ANALYZE_BATCH_SIZE]] if data.metadata else [None]*len(comments_to_process)
+    analyze_logger.debug("Extracted usernames: %s", usernames)
+    # Per-comment product as ingest stored it; the top-level product is the page heading or missing
+    review_products = [
+        normalize_product_name((item.get("product") if isinstance(item, dict) else None) or product)
+        for item in (data.metadata or [])[:ANALYZE_BATCH_SIZE]
+    ] or [normalize_product_name(product)] * len(comments_to_process)
+    # Identical page payloads (same product page opened by many users) share one pipeline run
+    key = request_key(
+        product=product,
+        comments=comments_to_process,
+        usernames=usernames,
+        review_products=review_products,
+        prompt=prompt,
+        provider="gemini" if gemini_api_key else "ollama"
+    )
+    try:
+        response, outcome = await run_until_disconnected(
+            request,
+            analysis_flight.do(
+                key,
+                lambda: llm_scheduler.run(
+                    INTERACTIVE,
+                    lambda: run_analysis_pipeline(comments_to_process, usernames, review_products, prompt, product, gemini_api_key)
+                )
+            ),
+            DISCONNECT_POLL_SECONDS
+        )
+    except SchedulerFull as e:
+        analyze_logger.warning("Analysis queue full, rejecting request (retry after %ds)", e.retry_after)
+        return JSONResponse(
+            status_code=429,
+            content={"message": "Analysis queue is full, please retry later", "retry_after": e.retry_after},
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except ClientDisconnected:
+        analyze_logger.info("Client disconnected, abandoning analysis of %d comments", len(comments_to_process))
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
+    ANALYSIS_DEDUP.inc(outcome=outcome)
+    elapsed = time.time() - start_time
+    analyze_logger.info("analyze_comments completed in %.2f seconds for %d comments (%s)", elapsed, len(comments_to_process), outcome)
+    return response
+
+
+async def run_analysis_pipeline(comments_to_process: List[str], usernames: List[Optional[str]], review_products: List[Optional[str]],
+                                prompt: str, product: str, gemini_api_key: str) -> Dict:
+    """First LLM pass, semantic + behavioral evidence and second LLM pass for one batch of comments"""
+    degraded: List[str] = []
+    _analysis_degradations.set(degraded)  # asyncio.to_thread copies the context, so worker threads report here too
+    analyze_logger.debug("Batch analyzing %d comments", len(comments_to_process))
     results = await analyze_comments_batch_ollama(comments_to_process, prompt=prompt, product=product, gemini_api_key=gemini_api_key)
-    logger.info(f"Completed analysis of {len(results)} comments")
+    analyze_logger.debug("Completed analysis of %d comments", len(results))
     for i, username in enumerate(usernames):
         if i < len(results):
             results[i]["username"] = username
-    suspicious_comments = analyze_suspicious_comment(results)
-    logger.info(f"suspicious_comments input: {json.dumps(suspicious_comments, default=str)}")
-    suspicious_comments_result = determine_review_genuinty(suspicious_comments)
+    for i, review_product in enumerate(review_products):
+        if i < len(results):
+            results[i]["product"] = review_product
+    # Semantic search, behavioral SQL and the second LLM pass are blocking; keep them off the event loop
+    suspicious_comments = await asyncio.to_thread(analyze_suspicious_comment, results, product)
+    if should_log_payload(analyze_logger):
+        analyze_logger.debug("suspicious_comments input: %s", PayloadPreview(suspicious_comments))
+    with stage_timer("llm_second_pass"):
+        suspicious_comments_result = await asyncio.to_thread(determine_review_genuinty, suspicious_comments)
     # Update suspicious_comments with verdict and explanation from suspicious_comments_result
     for idx, item in enumerate(suspicious_comments):
         if idx < len(suspicious_comments_result):
@@ -252,16 +400,59 @@ async def analyze_comments(data: CommentData):
             if res.get("comment") == suspicious.get("comment"):
                 res["verdict"] = suspicious.get("verdict")
                 res["explanation"] = suspicious.get("explanation")
-    elapsed = time.time() - start_time
-    logger.info(f"analyze_comments completed in {elapsed:.2f} seconds for {len(comments_to_process)} comments")
     return {
         "message": f"Processed {len(results)} comments",
         "results": results,
         "suspicious_comments": suspicious_comments,
-        "suspicious_comments_result": suspicious_comments_result
+        "suspicious_comments_result": suspicious_comments_result,
+        "degraded": degraded
     }
 
 
+async def request_first_pass_verdicts(system_prompt: str, user_prompt: str, gemini_api_key: str = None) -> str:
+    """Send one first-pass prompt to Gemini (falling back to Ollama) or Ollama and return the raw text"""
+    if gemini_api_key:
+        try:
+            from google import genai
+            try:
+                genai_version = importlib.metadata.version("google-generativeai")
+                llm_logger.debug("Google Generative AI version: %s", genai_version)
+            except Exception as version_error:
+                llm_logger.debug("Could not determine Google Generative AI version: %s", version_error)
+            # Per-request key; setting GOOGLE_API_KEY would race between concurrent jobs
+            client = genai.Client(api_key=gemini_api_key)
+            llm_logger.debug("Using Gemini Client API for analysis")
+            response_gemini = await asyncio.to_thread(
+                client.models.generate_content,
+                model="gemini-2.5-flash",
+                contents=[
+                    {"role": "user", "parts": [{"text": system_prompt}]},
+                    {"role": "user", "parts": [{"text": user_prompt}]}
+                ]
+            )
+            llm_logger.info("Gemini analysis completed successfully with gemini-2.5-flash")
+            return response_gemini.text.strip()
+        except Exception as e:
+            llm_logger.error("Error using Gemini API: %s", e)
+            # Fall back to Ollama if Gemini fails
+            llm_logger.info("Falling back to Ollama due to Gemini error")
+    response = await asyncio.to_thread(
+        requests.post,
+        OLLAMA_URL,
+        json={
+            "model": llm_model,
+            "prompt": user_prompt,
+            "system": system_prompt,
+            "stream": False
+        },
+        timeout=30  # Reduced from 60 to 30 seconds
+    )
+    llm_logger.debug("Using Ollama model %s for analysis", llm_model)
+    response.raise_for_status()
+    result_json = response.json()
+    return result_json.get("response", "").strip()
+
+
 async def analyze_comments_batch_ollama(comments: List[str], prompt: str = None, product: str = None, gemini_api_key: str = None) -> List[Dict]:
     start_time = time.time()
     try:
@@ -280,76 +471,33 @@ async def analyze_comments_batch_ollama(comments: List[str], prompt: str = None,
         )
         if product:
             base_prompt += f"Product: {product}\n"
-        for i, comment in enumerate(comments, 1):
-            base_prompt += f"{i}. Review: '{comment}'\n"
-        if gemini_api_key:
-            os.environ["GOOGLE_API_KEY"] = gemini_api_key
-            try:
-                from google import genai
-                try:
-                    genai_version = importlib.metadata.version("google-generativeai")
-                    logger.info(f"Google Generative AI version: {genai_version}")
-                except Exception as version_error:
-                    logger.warning(f"Could not determine Google Generative AI version: {str(version_error)}")
-                client = genai.Client()
-                logger.info("Using Gemini Client API for analysis")
-                response_gemini = client.models.generate_content(
-                    model="gemini-2.5-flash",
-                    contents=[
-                        {"role": "user", "parts": [{"text": system_prompt}]},
-                        {"role": "user", "parts": [{"text": base_prompt}]}
-                    ]
-                )
-                result_text = response_gemini.text.strip()
-                logger.info("Successfully used model: gemini-2.5-flash")
-                logger.info("Gemini analysis completed successfully")
-            except Exception as e:
-                logger.error(f"Error using Gemini API: {str(e)}")
-                # Fall back to Ollama if Gemini fails
-                logger.info("Falling back to Ollama due to Gemini error")
-                response = requests.post(
-                    "http://localhost:11434/api/generate",
-                    json={
-                        "model": llm_model,
-                        "prompt": base_prompt,
-                        "system": system_prompt,
-                        "stream": False
-                    },
-                    timeout=30  # Reduced from 60 to 30 seconds
-                )
-                response.raise_for_status()
-                result_json = response.json()
-                result_text = result_json.get("response", "").strip()
-        else:
-            response = requests.post(
-                "http://localhost:11434/api/generate",
-                json={
-                    "model": llm_model,
-                    "prompt": base_prompt,
-                    "system": system_prompt,
-                    "stream": False
-                },
-                timeout=30  # Reduced from 60 to 30 seconds
-            )
-            print("using ollama")
-            response.raise_for_status()
-            result_json = response.json()
-            result_text = result_json.get("response", "").strip()
-        lines = [line.strip() for line in result_text.split('\n') if line.strip()]
-        print(f"LLM response raw text: {result_text}")
-        results = []
+        # Identical reviews are sent once and long ones trimmed; each chunk stays under PROMPT_TOKEN_BUDGET
+        chunks, duplicates = pack_reviews(comments, system_prompt + base_prompt)
+        prompt_tokens = sum(chunk.tokens for chunk in chunks)
+        record_prompt_usage("llm_first_pass", prompt_tokens, len(chunks))
+        llm_logger.info("First pass prompt for %d comments: %d unique in %d chunks, ~%d tokens",
+                        len(comments), len(comments) - len(duplicates), len(chunks), prompt_tokens)
         comment_map = {}
-        # Try to match lines to comments by index, fallback to sequential assignment if no prefix match
-        for i in range(len(comments)):
-            # Prefer numbered prefix match
-            matched = False
-            for line in lines:
-                if line.startswith(f"{i+1}."):
-                    comment_map[i] = line
-                    matched = True
-                    break
-            if not matched and i < len(lines):
-                comment_map[i] = lines[i]
+        with stage_timer("llm_first_pass"):
+            for chunk in chunks:
+                result_text = await request_first_pass_verdicts(system_prompt, base_prompt + format_review_lines(chunk.reviews), gemini_api_key)
+                lines = [line.strip() for line in result_text.split('\n') if line.strip()]
+                llm_logger.debug("LLM response raw text: %s", PayloadPreview(result_text))
+                # Try to match lines to comments by index, fallback to sequential assignment if no prefix match
+                for position, idx in enumerate(chunk.indices):
+                    # Prefer numbered prefix match; numbering restarts at 1 in every chunk
+                    matched = False
+                    for line in lines:
+                        if line.startswith(f"{position+1}."):
+                            comment_map[idx] = line
+                            matched = True
+                            break
+                    if not matched and position < len(lines):
+                        comment_map[idx] = lines[position]
+        for idx, source_idx in duplicates.items():
+            if source_idx in comment_map:
+                comment_map[idx] = comment_map[source_idx]
+        results = []
         for idx, comment in enumerate(comments):
             if idx in comment_map:
                 result_line = comment_map[idx]
@@ -368,7 +516,7 @@ async def analyze_comments_batch_ollama(comments: List[str], prompt: str = None,
                 elif explanation.lower().startswith('suspicious') and len(explanation) < 10:
                     explanation = "Flagged as suspicious by analysis"
             else:
-                logger.error(f"No matching line for comment index {idx}: {comment}")
+                llm_logger.error("No matching line for comment index %d: %s", idx, truncate(comment, 80))
                 is_fake = None
                 explanation = "Analysis could not be completed"
             results.append({
@@ -378,12 +526,13 @@ async def analyze_comments_batch_ollama(comments: List[str], prompt: str = None,
                 "explanation": explanation
             })
         elapsed = time.time() - start_time
-        logger.info(f"analyze_comments_batch_ollama completed in {elapsed:.2f} seconds for {len(comments)} comments")
+        llm_logger.info("analyze_comments_batch_ollama completed in %.2f seconds for %d comments", elapsed, len(comments))
         return results
     except Exception as e:
-        logger.error(f"Error in batch analysis with Ollama/Gemini: {str(e)}")
+        llm_logger.error("Error in batch analysis with Ollama/Gemini: %s", e)
+        mark_analysis_degraded("llm_first_pass")
         elapsed = time.time() - start_time
-        logger.info(f"analyze_comments_batch_ollama failed in {elapsed:.2f} seconds for {len(comments)} comments")
+        llm_logger.info("analyze_comments_batch_ollama failed in %.2f seconds for %d comments", elapsed, len(comments))
         return [
             {
                 "comment": comment,  # Use full comment for behavioral analysis
@@ -397,13 +546,48 @@ async def analyze_comments_batch_ollama(comments: List[str], prompt: str = None,
 def get_db_connection():
     """Establish a connection to the PostgreSQL database"""
     try:
-        logger.info(f"Attempting DB connection with config: {DB_CONFIG}")
+        db_logger.debug("Opening DB connection to %s:%s/%s", DB_CONFIG["host"], DB_CONFIG["port"], DB_CONFIG["dbname"])
         conn = psycopg2.connect(**DB_CONFIG)
+        metrics.DB_CONNECTIONS_OPENED.inc()
         return conn
     except Exception as e:
-        logger.error(f"Database connection error: {str(e)} | Config: {DB_CONFIG}")
+        db_logger.error("Database connection error: %s | Host: %s:%s/%s", e, DB_CONFIG["host"], DB_CONFIG["port"], DB_CONFIG["dbname"])
         raise
 
+def prepare_review_storage(table_name):
+    """Create the partitioned review table if missing and ensure its indexes; failures are logged, not raised"""
+    global review_table_partitioned
+    if not table_name:
+        logger.error("Cannot prepare review storage without TABLE_NAME")
+        return
+    try:
+        conn = get_db_connection()
+        review_table_partitioned = bool(schema.prepare_review_table(conn, table_name))
+        conn.close()
+        logger.info("Review storage ready on %s (partitioned=%s)", table_name, review_table_partitioned)
+    except Exception as e:
+        logger.error("Error preparing review storage: %s | Table: %s", e, table_name)
+
+def refresh_review_table_layout(cursor):
+    """Re-check whether the review table is partitioned; one catalog lookup, only made while it is not"""
+    global review_table_partitioned
+    try:
+        if schema.is_partitioned(cursor, table_name):
+            review_table_partitioned = True
+            db_logger.info("Review table %s is now partitioned; creating monthly partitions on ingest", table_name)
+    except Exception as e:
+        db_logger.error("Error checking review table layout: %s | Table: %s", e, table_name)
+        cursor.connection.rollback()
+
+def clean_comment_text(comment):
+    """
+    Strip newlines and emojis exactly like the cleaning UPDATE does, so stored rows and their
+    (username, product, page_timestamp, comment_hash) key are already clean at insert time
+    """
+    if comment is None:
+        return None
+    return re.sub(COMMENT_DISALLOWED_PATTERN, "", re.sub(COMMENT_NEWLINE_PATTERN, "", comment))
+
 def clean_timestamp(timestamp_str):
     """
     Clean and format timestamp string for PostgreSQL.
@@ -430,43 +614,46 @@ def clean_timestamp(timestamp_str):
 
 def semantic_search_postgres(query: str, top_n: int):
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
+        conn = get_db_connection()
         cur = conn.cursor()
 
-        query_embedding = model.encode(query).tolist()
+        with stage_timer("encode"):
+            query_embedding = model.encode(query).tolist()
         
-        cur.execute(
-            """
-            SELECT id, comment, username, rating,
-                   1 - (embedding <=> %s::vector) AS similarity
-            FROM product_reviews
-            ORDER BY embedding <=> %s::vector
-            LIMIT %s;
-            """,
-            (query_embedding, query_embedding, top_n)
-        )
+        with stage_timer("semantic_search"):
+            cur.execute(
+                """
+                SELECT id, comment, username, rating,
+                       1 - (embedding <=> %s::vector) AS similarity
+                FROM product_reviews
+                ORDER BY embedding <=> %s::vector
+                LIMIT %s;
+                """,
+                (query_embedding, query_embedding, top_n)
+            )
 
-        results = cur.fetchall()
+            results = cur.fetchall()
         cur.close()
         conn.close()
         return results
 
     except Exception as error:
-        print(f"Error during semantic search in Postgres: {error}, query: {query}, top_n: {top_n}")
+        semantic_logger.error("Error during semantic search in Postgres: %s, query: %s, top_n: %d", error, truncate(query, 80), top_n)
+        mark_analysis_degraded("semantic_search")
         return None
 
 ########################## SEMANTIC FUNCTION
 
-def analyze_suspicious_comment(analysis_results: List[Dict]) -> List[Dict]:
-    logger.info(f"analyze_suspicious_comment called with {len(analysis_results)} results")
+def analyze_suspicious_comment(analysis_results: List[Dict], product: str = None) -> List[Dict]:
+    analyze_logger.debug("analyze_suspicious_comment called with %d results", len(analysis_results))
     suspicious_comments = []
     for idx, result in enumerate(analysis_results):
         explanation = result.get("explanation", "")
-        logger.info(f"Processing result {idx}: explanation='{explanation[:50]}...', starts_with_suspicious={explanation.lower().startswith('suspicious')}")
+        analyze_logger.debug("Processing result %d: explanation='%.50s...'", idx, explanation)
         if explanation.lower().startswith("suspicious"):
             verdict, sep, reason = explanation.partition("- ")
             username = result.get("username")
-            logger.info(f"Found suspicious comment {idx}: username='{username}', comment='{result.get('comment', '')[:30]}...'")
+            analyze_logger.debug("Found suspicious comment %d: username='%s', comment='%.30s...'", idx, username, result.get("comment", ""))
             # Try to get username from metadata if not present
             if not username and "metadata" in result and isinstance(result["metadata"], dict):
                 username = result["metadata"].get("username")
@@ -482,16 +669,18 @@ def analyze_suspicious_comment(analysis_results: List[Dict]) -> List[Dict]:
                     if isinstance(meta, dict):
                         username = meta.get("username")
             if not username:
-                logger.warning(f"No username found for suspicious comment: {result.get('comment')}")
+                analyze_logger.warning("No username found for suspicious comment: %s", truncate(result.get("comment"), 80))
             semantic_analysis = suspicious_comment_semantic_search(result.get("comment"))
-            logger.info(f"Semantic analysis for comment {idx}: {len(semantic_analysis)} scores")
+            semantic_logger.debug("Semantic analysis for comment %d: %d scores", idx, len(semantic_analysis))
             behavioral_analysis = []
             if username and result.get("comment"):
-                logger.info(f"Calling collect_behavioral_signals for comment {idx} with username='{username}'")
-                behavioral_analysis = collect_behavioral_signals(username, result.get("comment"), table_name)
-                logger.info(f"Behavioral analysis for comment {idx} returned {len(behavioral_analysis)} evidence items: {behavioral_analysis}")
+                behavioral_logger.debug("Calling collect_behavioral_signals for comment %d with username='%s'", idx, username)
+                # Burst lookups are keyed on the product ingest recorded for this review
+                review_product = result.get("product") or normalize_product_name(product)
+                behavioral_analysis = collect_behavioral_signals(username, result.get("comment"), table_name, product=review_product)
+                behavioral_logger.debug("Behavioral analysis for comment %d returned %d evidence items: %s", idx, len(behavioral_analysis), behavioral_analysis)
             else:
-                logger.warning(f"Skipping behavioral analysis for comment {idx}: username={username}, comment_exists={bool(result.get('comment'))}")
+                behavioral_logger.warning("Skipping behavioral analysis for comment %d: username=%s, comment_exists=%s", idx, username, bool(result.get("comment")))
             suspicious_comments.append({
                 "comment": result.get("comment"),
                 "username": username,
@@ -507,7 +696,8 @@ def suspicious_comment_semantic_search(comment: str) -> List[float]:
             return [row[4] for row in result if len(row) > 4]
         return []
     except Exception as error:
-        logger.error(f"Error analyzing suspicious comment: {error}, comment: {comment}")
+        semantic_logger.error("Error analyzing suspicious comment: %s, comment: %s", error, truncate(comment, 80))
+        mark_analysis_degraded("semantic_search")
         return []
 
 #################### clear postgresql
@@ -515,43 +705,60 @@ def suspicious_comment_semantic_search(comment: str) -> List[float]:
 def clean_postgresql_data(table_name):
     try:
         # Connect to Supabase PostgreSQL
-        conn = psycopg2.connect(**DB_CONFIG)
+        conn = get_db_connection()
         cur = conn.cursor()
-        print("Removing records with empty comment...")
+        cleaning_logger.debug("Removing records with empty comment...")
         try:
             cur.execute(f"DELETE FROM {table_name} WHERE comment IS NULL OR TRIM(comment) = '';")
             conn.commit()
         except psycopg2.errors.UniqueViolation as e:
-            logger.error(f"UniqueViolation removing empty comments: {str(e)} | Table: {table_name}")
+            cleaning_logger.error("UniqueViolation removing empty comments: %s | Table: %s", e, table_name)
             conn.rollback()
         except Exception as e:
-            logger.error(f"Error removing empty comments: {str(e)} | Table: {table_name}")
+            cleaning_logger.error("Error removing empty comments: %s | Table: %s", e, table_name)
             conn.rollback()
-        print("Removing emojis and \\n from text...")
+        cleaning_logger.debug("Removing emojis and newlines from text...")
+        patterns = {"newline": COMMENT_NEWLINE_PATTERN, "disallowed": COMMENT_DISALLOWED_PATTERN}
         try:
+            # Rows stored before ingest cleaned comments can clean to the same text as an existing row
+            # of the same review; drop those first, or the UPDATE violates the unique review key
+            cur.execute(f"""
+                WITH dirty AS (
+                    SELECT DISTINCT username, product, page_timestamp
+                    FROM {table_name}
+                    WHERE comment ~ %(newline)s OR comment ~ %(disallowed)s
+                ), ranked AS (
+                    SELECT
+                        r.id,
+                        ROW_NUMBER() OVER (
+                            PARTITION BY r.username, r.product, r.page_timestamp,
+                                REGEXP_REPLACE(REGEXP_REPLACE(r.comment, %(newline)s, '', 'g'), %(disallowed)s, '', 'g')
+                            ORDER BY (r.comment ~ %(newline)s OR r.comment ~ %(disallowed)s), r.id  -- keep an already clean row
+                        ) AS rn
+                    FROM {table_name} r
+                    JOIN dirty d ON d.username = r.username AND d.product = r.product AND d.page_timestamp = r.page_timestamp
+                )
+                DELETE FROM {table_name}
+                WHERE id IN (SELECT id FROM ranked WHERE rn > 1);
+            """, patterns)
             cur.execute(f"""
                 UPDATE {table_name}
                 SET comment = REGEXP_REPLACE(
-                    REGEXP_REPLACE(
-                        comment,
-                        '[\\n\\r]',  -- Remove newlines
-                        '',
-                        'g'
-                    ),
-                    '[^\\u0000-\\u007F\\u4E00-\\u9FFF\\u3400-\\u4DBF\\u2000-\\u206F\\u3000-\\u303F\\uFF00-\\uFFEF]',  -- Remove emojis, preserve Chinese
+                    REGEXP_REPLACE(comment, %(newline)s, '', 'g'),  -- Remove newlines
+                    %(disallowed)s,  -- Remove emojis, preserve Chinese
                     '',
                     'g'
                 )
-                WHERE comment ~ '[\\n\\r]' OR comment ~ '[^\\u0000-\\u007F\\u4E00-\\u9FFF\\u3400-\\u4DBF\\u2000-\\u206F\\u3000-\\u303F\\uFF00-\\uFFEF]';
-            """)
+                WHERE comment ~ %(newline)s OR comment ~ %(disallowed)s;
+            """, patterns)
             conn.commit()
         except psycopg2.errors.UniqueViolation as e:
-            logger.error(f"UniqueViolation removing emojis/newlines: {str(e)} | Table: {table_name}")
+            cleaning_logger.error("UniqueViolation removing emojis/newlines: %s | Table: %s", e, table_name)
             conn.rollback()
         except Exception as e:
-            logger.error(f"Error removing emojis/newlines: {str(e)} | Table: {table_name}")
+            cleaning_logger.error("Error removing emojis/newlines: %s | Table: %s", e, table_name)
             conn.rollback()
-        print("Removing duplicated comments...")
+        cleaning_logger.debug("Removing duplicated comments...")
         try:
             cur.execute(f"""
                 WITH ranked_comments AS (
@@ -575,25 +782,27 @@ def clean_postgresql_data(table_name):
             """)
             conn.commit()
         except psycopg2.errors.UniqueViolation as e:
-            logger.error(f"UniqueViolation removing duplicated comments: {str(e)} | Table: {table_name}")
+            cleaning_logger.error("UniqueViolation removing duplicated comments: %s | Table: %s", e, table_name)
             conn.rollback()
         except Exception as e:
-            logger.error(f"Error removing duplicated comments: {str(e)} | Table: {table_name}")
+            cleaning_logger.error("Error removing duplicated comments: %s | Table: %s", e, table_name)
             conn.rollback()
-        print("Fetching records with no embedding...")
+        cleaning_logger.debug("Fetching records with no embedding...")
         try:
             cur.execute(f"SELECT id, comment FROM {table_name} WHERE embedding IS NULL;")
             rows = cur.fetchall()
         except Exception as e:
-            logger.error(f"Error fetching records with no embedding: {str(e)} | Table: {table_name}")
+            cleaning_logger.error("Error fetching records with no embedding: %s | Table: %s", e, table_name)
             conn.rollback()
             rows = []
-        print("Embedding records with no embedding...")
-        for row_id, text in tqdm(rows):
+        cleaning_logger.info("Embedding %d records with no embedding", len(rows))
+        # Progress bar only when cleaning is being debugged; it writes to stderr on every row
+        for row_id, text in tqdm(rows, disable=not cleaning_logger.isEnabledFor(logging.DEBUG)):
             try:
-                embedding = model.encode(text).tolist()
+                with stage_timer("encode"):
+                    embedding = model.encode(text).tolist()
             except Exception as e:
-                print(f"Error embedding row {row_id}: {e}")
+                cleaning_logger.error("Error embedding row %s: %s", row_id, e)
                 embedding = None
             try:
                 cur.execute(
@@ -602,48 +811,53 @@ def clean_postgresql_data(table_name):
                 )
                 conn.commit()
             except Exception as e:
-                logger.error(f"Error updating embedding for row {row_id}: {str(e)} | Table: {table_name}")
+                cleaning_logger.error("Error updating embedding for row %s: %s | Table: %s", row_id, e, table_name)
                 conn.rollback()
         cur.close()
         conn.close()
-        print("Done!")
+        cleaning_logger.debug("clean_postgresql_data done")
     except Exception as e:
-        logger.error(f"Error in clean_postgresql_data: {str(e)} | Table: {table_name}")
+        cleaning_logger.error("Error in clean_postgresql_data: %s | Table: %s", e, table_name)
         if 'Could not determine Google Generative AI version' in str(e):
             pass
         else:
             raise
 
 def determine_review_genuinty(suspicious_comments: List[Dict]) -> List[Dict]:
-    logger.info(f"determine_review_genuinty called with {len(suspicious_comments)} suspicious comments")
+    llm_logger.debug("determine_review_genuinty called with %d suspicious comments", len(suspicious_comments))
     semantic_scores = [item["analysis"] for item in suspicious_comments if "analysis" in item]
     behavioral_results = [item["behavioral"] for item in suspicious_comments if "behavioral" in item]
-    logger.info(f"Processing {len(semantic_scores)} semantic scores and {len(behavioral_results)} behavioral results")
+    llm_logger.debug("Processing %d semantic scores and %d behavioral results", len(semantic_scores), len(behavioral_results))
     
-    # OPTIMIZATION: Use existing behavioral results instead of re-running analysis
-    behavioral_evidence = behavioral_results  # Use already computed results
+    # Behavioral evidence used to be sent twice (Behavioral and BehavioralEvidence); send it once, compacted
+    semantic_scores = compact_scores(semantic_scores)
+    behavioral_results = dedupe_evidence(behavioral_results)
     try:
+        second_pass_prompt = (
+            "You are a fake review evaluator for e-commerce. For each review, classify as 'Fake' if either the behavioral analysis OR the semantic analysis indicates suspicious or promotional activity, even if only one is present. Classify as 'Genuine' ONLY if both behavioral and semantic analysis are normal. For each review, explain the reason in simple, clear, and confident language that any online shopper can understand. Avoid technical terms like 'semantic analysis' or 'behavioral analysis'. Use direct phrases like 'This review is fake because...' or 'This review is genuine because...'. Keep explanations short, direct, and easy to read. Do not use words like 'semantic', 'behavioral', 'embedding', or 'similarity'.\n"
+            "If the review is flagged for semantic reasons (e.g., overly promotional, vague, lacks product details), but behavioral is normal, classify as 'Fake'. If the review is flagged for behavioral reasons (e.g., abnormal posting pattern), but behavioral is normal, classify as 'Fake'. If both are normal, classify as 'Genuine'. If the review is vague/promotional or looks copied, classify as 'Fake' and do not hedge or say further investigation is needed. Be decisive and confident: if any signal is suspicious, verdict must be 'Fake'.\n"
+            f"Semantic: {json.dumps(semantic_scores)}\n"
+            f"Behavioral: {json.dumps(behavioral_results)}\n\n"
+            "Respond strictly with:\n"
+            "1. A **Python-style list** of classifications in this exact format:\n"
+            "   ['Genuine', 'Fake', 'Genuine']\n"
+            "2. A **Python-style list** of single sentence explanations for each review, matching the order above. Each explanation should clearly and confidently describe why the review is classified as 'Fake' or 'Genuine', and must not contradict the verdict. Do not use uncertain language like 'may be fake', 'seems fake', or 'further investigation is needed'—be direct and confident.\n\n"
+            "Do NOT add any introductions or explanations before the lists.\n"
+            "Begin your response immediately with the classification list, then the explanation list.\n"
+            "Example response:\n"
+            "['Genuine', 'Fake']\n"
+            "['This review is genuine because it provides specific product details and personal experience.', 'This review is fake because the user reused the same comment multiple times.']"
+        )
+        system_prompt = "You are a strict output generator. Follow the output format exactly and avoid unnecessary text."
+        prompt_tokens = estimate_tokens(system_prompt + second_pass_prompt)
+        record_prompt_usage("llm_second_pass", prompt_tokens, 1)
+        llm_logger.info("Second pass prompt for %d suspicious comments, ~%d tokens", len(suspicious_comments), prompt_tokens)
         response = requests.post(
-            "http://localhost:11434/api/generate",
+            OLLAMA_URL,
             json={
                 "model": f"{llm_model}",
-                "prompt": (
-                    "You are a fake review evaluator for e-commerce. For each review, classify as 'Fake' if either the behavioral analysis OR the semantic analysis indicates suspicious or promotional activity, even if only one is present. Classify as 'Genuine' ONLY if both behavioral and semantic analysis are normal. For each review, explain the reason in simple, clear, and confident language that any online shopper can understand. Avoid technical terms like 'semantic analysis' or 'behavioral analysis'. Use direct phrases like 'This review is fake because...' or 'This review is genuine because...'. Keep explanations short, direct, and easy to read. Do not use words like 'semantic', 'behavioral', 'embedding', or 'similarity'.\n"
-                    "If the review is flagged for semantic reasons (e.g., overly promotional, vague, lacks product details), but behavioral is normal, classify as 'Fake'. If the review is flagged for behavioral reasons (e.g., abnormal posting pattern), but behavioral is normal, classify as 'Fake'. If both are normal, classify as 'Genuine'. If the review is vague/promotional or looks copied, classify as 'Fake' and do not hedge or say further investigation is needed. Be decisive and confident: if any signal is suspicious, verdict must be 'Fake'.\n"
-                    f"Semantic: {json.dumps(semantic_scores)}\n"
-                    f"Behavioral: {json.dumps(behavioral_results)}\n"
-                    f"BehavioralEvidence: {json.dumps(behavioral_evidence)}\n\n"
-                    "Respond strictly with:\n"
-                    "1. A **Python-style list** of classifications in this exact format:\n"
-                    "   ['Genuine', 'Fake', 'Genuine']\n"
-                    "2. A **Python-style list** of single sentence explanations for each review, matching the order above. Each explanation should clearly and confidently describe why the review is classified as 'Fake' or 'Genuine', and must not contradict the verdict. Do not use uncertain language like 'may be fake', 'seems fake', or 'further investigation is needed'—be direct and confident.\n\n"
-                    "Do NOT add any introductions or explanations before the lists.\n"
-                    "Begin your response immediately with the classification list, then the explanation list.\n"
-                    "Example response:\n"
-                    "['Genuine', 'Fake']\n"
-                    "['This review is genuine because it provides specific product details and personal experience.', 'This review is fake because the user reused the same comment multiple times.']"
-                ),
-                "system": "You are a strict output generator. Follow the output format exactly and avoid unnecessary text.",
+                "prompt": second_pass_prompt,
+                "system": system_prompt,
                 "stream": False
             },
             timeout=20  # Reduced from 60 to 20 seconds for faster response
@@ -663,7 +877,7 @@ def determine_review_genuinty(suspicious_comments: List[Dict]) -> List[Dict]:
                     else:
                         explanations = parsed
                 except Exception as e:
-                    logger.error(f"Error parsing list: {str(e)} | line: {line}")
+                    llm_logger.error("Error parsing list: %s | line: %s", e, truncate(line, 200))
         result = []
         for idx, item in enumerate(suspicious_comments):
             verdict = verdicts[idx] if idx < len(verdicts) else None
@@ -671,6 +885,7 @@ def determine_review_genuinty(suspicious_comments: List[Dict]) -> List[Dict]:
             
             # Provide fallbacks if parsing failed
             if not verdict:
+                mark_analysis_degraded("llm_second_pass")
                 # Use original analysis result as fallback
                 original_explanation = item.get("explanation", "")
                 if "suspicious" in original_explanation.lower() or "fake" in original_explanation.lower():
@@ -699,10 +914,12 @@ def determine_review_genuinty(suspicious_comments: List[Dict]) -> List[Dict]:
                 "verdict": verdict or "GENUINE",  # Default to GENUINE if still null
                 "explanation": explanation or "This review appears to be authentic"
             })
-        logger.info(f"determine_review_genuinty result: {json.dumps(result, default=str)}")
+        if should_log_payload(llm_logger):
+            llm_logger.debug("determine_review_genuinty result: %s", PayloadPreview(result))
         return result
     except Exception as e:
-        logger.error(f"Error in determine_review_genuinty: {str(e)}")
+        llm_logger.error("Error in determine_review_genuinty: %s", e)
+        mark_analysis_degraded("llm_second_pass")
         # Provide better fallback based on original analysis
         result = []
         for item in suspicious_comments:
@@ -726,22 +943,24 @@ def determine_review_genuinty(suspicious_comments: List[Dict]) -> List[Dict]:
 # ─── DB Helper ────────────────────────────────────────────────────────────────
 def _execute_query_with_param(query, params):
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
+        conn = get_db_connection()
         cursor = conn.cursor()
-        cursor.execute(query, params)
-        result = cursor.fetchall()
-        logger.info(f"Query result: {result}")
+        with stage_timer("behavioral_sql"):
+            cursor.execute(query, params)
+            result = cursor.fetchall()
+        db_logger.debug("Query returned %d rows", len(result))
         cursor.close()
         conn.close()
         return result
     except Exception as e:
-        logger.error(f"SQL Error: {e} | Query: {query} | Params: {params}")
+        db_logger.error("SQL Error: %s | Query: %s | Params: %s", e, truncate(" ".join(query.split()), 200), PayloadPreview(params, 200))
+        mark_analysis_degraded("db_query")
         return None
 
 
 # ─── SQL Query Wrappers ────────────────────────────────────────────────────────
 def query_same_comment_multiple_users(comment, table_name):
-    logger.info(f"query_same_comment_multiple_users called with comment='{comment[:30]}...', table='{table_name}'")
+    behavioral_logger.debug("query_same_comment_multiple_users called with comment='%.30s...', table='%s'", comment, table_name)
     sql = f"""
     SELECT COUNT(DISTINCT username)
     FROM {table_name}
@@ -752,7 +971,7 @@ def query_same_comment_multiple_users(comment, table_name):
 
 
 def query_user_repeated_same_comment(username, comment, table_name):
-    logger.info(f"query_user_repeated_same_comment called with username='{username}', comment='{comment[:30]}...', table='{table_name}'")
+    behavioral_logger.debug("query_user_repeated_same_comment called with username='%s', comment='%.30s...', table='%s'", username, comment, table_name)
     sql = f"""
     SELECT COUNT(*)
     FROM {table_name}
@@ -763,13 +982,13 @@ def query_user_repeated_same_comment(username, comment, table_name):
 
 
 def query_comment_length(comment, table_name):
-    logger.info(f"query_comment_length called with comment='{comment[:30]}...', table='{table_name}'")
+    behavioral_logger.debug("query_comment_length called with comment='%.30s...', table='%s'", comment, table_name)
     sql = "SELECT LENGTH(%s)"
     result = _execute_query_with_param(sql, (comment,))
     return result
 
 def query_duplicate_comment_across_products(comment, table_name):
-    logger.info(f"query_duplicate_comment_across_products called with comment='{comment[:30]}...', table='{table_name}'")
+    behavioral_logger.debug("query_duplicate_comment_across_products called with comment='%.30s...', table='%s'", comment, table_name)
     sql = f"""
     SELECT COUNT(DISTINCT product)
     FROM {table_name}
@@ -786,14 +1005,107 @@ def query_user_posting_rate(username, table_name):
     """
     return _execute_query_with_param(sql, (username,))
 
-def collect_behavioral_signals(username, comment, table_name):
+def query_user_review_timestamps(username, table_name):
+    """Load a user's recent review history for burst detection (uses the (username, page_timestamp) index)"""
+    sql = f"""
+    SELECT product, page_timestamp
+    FROM {table_name}
+    WHERE username = %s AND page_timestamp IS NOT NULL
+    ORDER BY page_timestamp DESC
+    LIMIT %s
+    """
+    return _execute_query_with_param(sql, (username, BURST_HISTORY_LIMIT))
+
+def query_product_review_timestamps(product, table_name):
+    """Load a product's recent review history for burst detection (uses the (product, page_timestamp) index)"""
+    sql = f"""
+    SELECT username, page_timestamp
+    FROM {table_name}
+    WHERE (product = %s OR product LIKE %s OR product LIKE %s) AND page_timestamp IS NOT NULL
+    ORDER BY page_timestamp DESC
+    LIMIT %s
+    """
+    # Rows ingested before product names were normalized still carry the raw document.title
+    prefix = product.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return _execute_query_with_param(sql, (product, prefix + " | Shopee%", prefix + " - Shopee%", BURST_HISTORY_LIMIT))
+
+burst_detector = BurstDetector(
+    review_count=USER_FAST_REVIEW_COUNT,
+    review_interval=USER_FAST_REVIEW_INTERVAL,
+    burst_user_count=COORDINATED_BURST_USER_COUNT,
+    burst_interval=COORDINATED_BURST_INTERVAL,
+    burst_rate_multiplier=COORDINATED_BURST_RATE_MULTIPLIER,
+    user_loader=lambda username: query_user_review_timestamps(username, table_name),
+    product_loader=lambda product: query_product_review_timestamps(product, table_name),
+)
+metrics.CACHE_ENTRIES.add_function(lambda: {
+    ("burst_users",): burst_detector.stats()["tracked_users"],
+    ("burst_products",): burst_detector.stats()["tracked_products"],
+})
+
+# Stages of the current analysis that fell back to partial data (DB or LLM errors); None outside a pipeline run
+_analysis_degradations: contextvars.ContextVar[Optional[List[str]]] = contextvars.ContextVar("analysis_degradations", default=None)
+
+
+def mark_analysis_degraded(stage: str) -> None:
+    degraded = _analysis_degradations.get()
+    if degraded is not None and stage not in degraded:
+        degraded.append(stage)
+
+
+def is_complete_analysis(response: Dict) -> bool:
+    """Only cache responses built from full data where the first LLM pass classified every comment"""
+    if response.get("degraded"):
+        return False
+    return all(result.get("is_fake") is not None for result in response.get("results", []))
+
+analysis_flight = SingleFlight(
+    ttl_seconds=ANALYZE_CACHE_TTL_SECONDS,
+    max_entries=ANALYZE_CACHE_MAX_ENTRIES,
+    should_cache=is_complete_analysis
+)
+ANALYSIS_DEDUP = metrics.REGISTRY.register(metrics.Counter(
+    "spotcheck_analysis_requests_total",
+    "/analyze requests by how they were served (leader ran the pipeline, joined an in-flight run, or cache hit)",
+    ["outcome"]
+))
+cleaning_runner = SerialRunner("cleaning")
+llm_scheduler = WorkScheduler(
+    workers=LLM_WORKERS,
+    max_queue_depth={INTERACTIVE: INTERACTIVE_QUEUE_DEPTH, BACKGROUND: BACKGROUND_QUEUE_DEPTH}
+)
+metrics.CACHE_ENTRIES.add_function(lambda: {
+    ("analysis_responses",): analysis_flight.stats()["cached"],
+    ("analysis_in_flight",): analysis_flight.stats()["in_flight"],
+})
+
+def collect_burst_signals(username, product=None):
+    """Cheap in-memory lookup of reviewer and coordinated bursts"""
+    evidence = []
+    try:
+        # Both checks look only at windows around this user's review of this product
+        user_burst = burst_detector.user_burst(username, product)
+        if user_burst["flagged"]:
+            evidence.append(f"User posted {user_burst['window_count']} reviews within {USER_FAST_REVIEW_INTERVAL}.")
+            behavioral_logger.debug("Added evidence: User burst of %d reviews", user_burst["window_count"])
+        if product:
+            product_burst = burst_detector.product_burst(product, username)
+            if product_burst["flagged"]:
+                evidence.append(f"Review is part of a burst of {product_burst['window_users']} users reviewing this product within {COORDINATED_BURST_INTERVAL}.")
+                behavioral_logger.debug("Added evidence: Coordinated burst of %d users on product (threshold %d, expected %.1f)",
+                                        product_burst["window_users"], product_burst["threshold"], product_burst["expected_users"])
+    except Exception as e:
+        behavioral_logger.error("Error in burst detection lookup: %s", e)
+    return evidence
+
+def collect_behavioral_signals(username, comment, table_name, product=None):
     """Optimized behavioral analysis with batch queries"""
-    logger.info(f"collect_behavioral_signals called with username='{username}', comment_length={len(comment) if comment else 0}, table='{table_name}'")
+    behavioral_logger.debug("collect_behavioral_signals called with username='%s', comment_length=%d, table='%s'", username, len(comment) if comment else 0, table_name)
     evidence = []
     
     # OPTIMIZATION: Use single connection for all queries
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
+        conn = get_db_connection()
         cursor = conn.cursor()
         
         # Batch all queries in a single database call
@@ -805,8 +1117,9 @@ def collect_behavioral_signals(username, comment, table_name):
             (SELECT COUNT(DISTINCT product) FROM {table_name} WHERE comment = %s) AS multiple_products
         """
         
-        cursor.execute(batch_query, (comment, username, comment, comment, comment))
-        result = cursor.fetchone()
+        with stage_timer("behavioral_sql"):
+            cursor.execute(batch_query, (comment, username, comment, comment, comment))
+            result = cursor.fetchone()
         cursor.close()
         conn.close()
         
@@ -815,27 +1128,27 @@ def collect_behavioral_signals(username, comment, table_name):
             
             if multiple_users > 1:
                 evidence.append("Same comment used by multiple users.")
-                logger.info(f"Added evidence: Same comment used by {multiple_users} multiple users")
+                behavioral_logger.debug("Added evidence: Same comment used by %d multiple users", multiple_users)
                 
             if user_repeats > 1:
                 evidence.append("User reused the same comment.")
-                logger.info(f"Added evidence: User reused comment {user_repeats} times")
+                behavioral_logger.debug("Added evidence: User reused comment %d times", user_repeats)
                 
             if comment_length < 20:
                 evidence.append("Comment is short (under 20 chars).")
-                logger.info(f"Added evidence: Short comment length {comment_length} chars")
+                behavioral_logger.debug("Added evidence: Short comment length %d chars", comment_length)
                 
             if multiple_products > 1:
                 evidence.append("Same comment used for multiple products.")
-                logger.info(f"Added evidence: Comment used for {multiple_products} products")
+                behavioral_logger.debug("Added evidence: Comment used for %d products", multiple_products)
         
     except Exception as e:
-        logger.error(f"Error in optimized behavioral analysis: {str(e)}")
-        logger.error(f"Exception details: {type(e).__name__}: {str(e)}")
-        import traceback
-        logger.error(f"Traceback: {traceback.format_exc()}")
+        behavioral_logger.exception("Error in optimized behavioral analysis: %s: %s", type(e).__name__, e)
+        mark_analysis_degraded("behavioral_sql")
 
-    logger.info(f"collect_behavioral_signals returning {len(evidence)} evidence items: {evidence}")
+    with stage_timer("burst_lookup"):
+        evidence.extend(collect_burst_signals(username, product))
+    behavioral_logger.debug("collect_behavioral_signals returning %d evidence items: %s", len(evidence), evidence)
     return evidence
 
 
@@ -0,0 +1,307 @@
+import bisect
+import datetime
+import math
+import re
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+
+# ─── Constants ─────────────────────────────────────────────────────────────────
+DEFAULT_MAX_TRACKED_USERS = 50000
+DEFAULT_MAX_TRACKED_PRODUCTS = 5000
+DEFAULT_BURST_RATE_MULTIPLIER = 3.0
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M"
+_EPOCH = datetime.datetime(1970, 1, 1)
+_INTERVAL_UNIT_SECONDS = {
+    "second": 1,
+    "minute": 60,
+    "hour": 3600,
+    "day": 86400,
+    "week": 604800,
+}
+# " | Shopee Malaysia" / " - Shopee" suffix of document.title, which ingest stores as the product
+_SHOPEE_TITLE_SUFFIX = re.compile(r"\s+[|\-–]\s+Shopee\b.*$", re.IGNORECASE)
+_INTERVAL_PATTERN = re.compile(r"^\s*(\d+)\s*(second|minute|hour|day|week)s?\s*$", re.IGNORECASE)
+
+# (product or username, page_timestamp) rows as returned by the loaders
+ActivityRow = Tuple[Optional[str], object]
+
+
+def interval_to_seconds(interval: str) -> int:
+    """Convert a PostgreSQL-style interval such as '1 hour' or '10 minutes' to seconds"""
+    match = _INTERVAL_PATTERN.match(interval or "")
+    if not match:
+        raise ValueError(f"Unsupported interval: {interval!r}")
+    return int(match.group(1)) * _INTERVAL_UNIT_SECONDS[match.group(2).lower()]
+
+
+def normalize_product_name(product: Optional[str]) -> Optional[str]:
+    """
+    Canonical product key. The extension uploads document.title with ingest but sends the page's
+    product heading (or nothing) with /analyze; stripping the Shopee title suffix makes them match.
+    """
+    if not product:
+        return None
+    product = " ".join(_SHOPEE_TITLE_SUFFIX.sub("", product).split())
+    return product or None
+
+
+def to_epoch_seconds(timestamp) -> Optional[float]:
+    """Normalize a page_timestamp (datetime or 'YYYY-MM-DD HH:MM' string) to epoch seconds"""
+    if timestamp is None:
+        return None
+    if isinstance(timestamp, str):
+        try:
+            timestamp = datetime.datetime.strptime(timestamp.strip(), TIMESTAMP_FORMAT)
+        except ValueError:
+            try:
+                timestamp = datetime.datetime.fromisoformat(timestamp.strip())
+            except ValueError:
+                return None
+    if not isinstance(timestamp, datetime.datetime):
+        return None
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return (timestamp - _EPOCH).total_seconds()
+
+
+class _UserActivity:
+    """Sorted review timestamps for one user, with the product of each review"""
+
+    __slots__ = ("times", "products", "seen", "hydrated")
+
+    def __init__(self):
+        self.times: List[float] = []
+        self.products: List[Optional[str]] = []
+        self.seen = set()
+        self.hydrated = False
+
+
+class _ProductActivity:
+    """Sorted (timestamp, username) entries for one product"""
+
+    __slots__ = ("times", "users", "seen", "hydrated")
+
+    def __init__(self):
+        self.times: List[float] = []
+        self.users: List[str] = []
+        self.seen = set()
+        self.hydrated = False
+
+
+class BurstDetector:
+    """
+    Maintains per-user and per-product review timelines and evaluates sliding windows on demand.
+    Windows are measured on page_timestamp, so history replayed in any order yields the same result.
+    Only windows that contain the reviewer's own review of the product are considered, so a busy
+    product does not implicate every reviewer it ever had. A coordinated burst needs at least
+    `burst_user_count` distinct users and `burst_rate_multiplier` times the users the product's
+    review rate outside the window would predict. Timelines are updated incrementally at ingest;
+    users or products not yet seen in this process are hydrated once from the database.
+    """
+
+    def __init__(
+        self,
+        review_count: int,
+        review_interval: str,
+        burst_user_count: int,
+        burst_interval: str,
+        burst_rate_multiplier: float = DEFAULT_BURST_RATE_MULTIPLIER,
+        user_loader: Optional[Callable[[str], Optional[List[ActivityRow]]]] = None,
+        product_loader: Optional[Callable[[str], Optional[List[ActivityRow]]]] = None,
+        max_tracked_users: int = DEFAULT_MAX_TRACKED_USERS,
+        max_tracked_products: int = DEFAULT_MAX_TRACKED_PRODUCTS,
+    ):
+        assert review_count > 0 and burst_user_count > 1, "Burst thresholds must be positive"
+        assert burst_rate_multiplier >= 0, "burst_rate_multiplier must not be negative"
+        self.review_count = review_count
+        self.review_interval = review_interval
+        self.burst_user_count = burst_user_count
+        self.burst_interval = burst_interval
+        self.burst_rate_multiplier = burst_rate_multiplier
+        self._review_window = interval_to_seconds(review_interval)
+        self._burst_window = interval_to_seconds(burst_interval)
+        self._user_loader = user_loader
+        self._product_loader = product_loader
+        self._max_tracked_users = max_tracked_users
+        self._max_tracked_products = max_tracked_products
+        self._users: "OrderedDict[str, _UserActivity]" = OrderedDict()
+        self._products: "OrderedDict[str, _ProductActivity]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    # ─── Ingest ──────────────────────────────────────────────────────────────
+    def record_review(self, username: Optional[str], product: Optional[str], timestamp) -> None:
+        """
+        Add a single stored review to the timelines.
+        Reviews are keyed on (product, page_timestamp) per user rather than on comment text,
+        because clean_postgresql_data rewrites comments after ingest and re-scraped pages must not count twice.
+        """
+        ts = to_epoch_seconds(timestamp)
+        product = normalize_product_name(product)
+        if not username or ts is None:
+            return
+        with self._lock:
+            user_activity = self._get_or_create(self._users, username, _UserActivity, self._max_tracked_users)
+            _insert_entry(user_activity, (product, ts), ts, user_activity.products, product)
+            if product:
+                product_activity = self._get_or_create(self._products, product, _ProductActivity, self._max_tracked_products)
+                _insert_entry(product_activity, (username, ts), ts, product_activity.users, username)
+
+    def record_reviews(self, rows: Iterable[Tuple]) -> int:
+        """Add stored rows shaped like the ingest insert (comment, username, rating, source, product, page_timestamp)"""
+        recorded = 0
+        for _comment, username, _rating, _source, product, timestamp in rows:
+            if username and timestamp is not None:
+                self.record_review(username, product, timestamp)
+                recorded += 1
+        return recorded
+
+    # ─── Lookup ──────────────────────────────────────────────────────────────
+    def user_burst(self, username: str, product: Optional[str] = None) -> Dict:
+        """
+        Busiest review window for a user among windows containing their review(s) of `product`.
+        Without a product (or with no timestamped review of it) every review of the user is considered.
+        """
+        product = normalize_product_name(product)
+        activity = self._ensure_user(username)
+        count, start = 0, None
+        with self._lock:
+            if activity:
+                times = activity.times
+                anchors = [ts for ts, reviewed in zip(times, activity.products) if reviewed == product] if product else []
+                for ts in anchors or times:
+                    for index in _window_starts(times, ts, self._review_window):
+                        window_count = bisect.bisect_right(times, times[index] + self._review_window) - index
+                        if window_count > count:
+                            count, start = window_count, times[index]
+        return {
+            "username": username,
+            "product": product,
+            "window_count": count,
+            "window_start": start,
+            "interval": self.review_interval,
+            "flagged": count > self.review_count,
+        }
+
+    def product_burst(self, product: str, username: str) -> Dict:
+        """
+        Largest group of distinct users reviewing a product inside a burst window that contains
+        one of `username`'s reviews of it, and whether that group counts as a coordinated burst
+        """
+        product = normalize_product_name(product)
+        activity = self._ensure_product(product) if product else None
+        best = {"window_users": 0, "window_start": None, "threshold": self.burst_user_count, "expected_users": 0.0}
+        with self._lock:
+            if activity and username:
+                times, users = activity.times, activity.users
+                span = max(times[-1] - times[0], self._burst_window)
+                for position, user in enumerate(users):
+                    if user != username:
+                        continue
+                    for index in _window_starts(times, times[position], self._burst_window):
+                        end = bisect.bisect_right(times, times[index] + self._burst_window)
+                        distinct = len(set(users[index:end]))
+                        # Normal rate: reviews outside this window spread over the product's history
+                        expected = (len(times) - (end - index)) * self._burst_window / span
+                        threshold = max(self.burst_user_count, math.ceil(self.burst_rate_multiplier * expected))
+                        if distinct - threshold > best["window_users"] - best["threshold"] or best["window_start"] is None:
+                            best = {"window_users": distinct, "window_start": times[index], "threshold": threshold,
+                                    "expected_users": round(expected, 2)}
+        return {
+            "product": product,
+            "username": username,
+            **best,
+            "interval": self.burst_interval,
+            "flagged": best["window_start"] is not None and best["window_users"] >= best["threshold"],
+        }
+
+    def stats(self) -> Dict[str, int]:
+        """Number of users and products currently held in memory"""
+        with self._lock:
+            return {"tracked_users": len(self._users), "tracked_products": len(self._products)}
+
+    # ─── Hydration ───────────────────────────────────────────────────────────
+    def _ensure_user(self, username: str) -> Optional[_UserActivity]:
+        with self._lock:
+            activity = self._users.get(username)
+            if activity is not None:
+                self._users.move_to_end(username)
+                if activity.hydrated or self._user_loader is None:
+                    return activity
+        if self._user_loader is None:
+            return None
+        rows = self._user_loader(username)
+        if rows is None:
+            # Loader failed; fall back to whatever ingest has recorded so far
+            return activity
+        with self._lock:
+            activity = self._get_or_create(self._users, username, _UserActivity, self._max_tracked_users)
+            entries = list(zip(activity.times, activity.products))
+            for product, timestamp in rows:
+                ts = to_epoch_seconds(timestamp)
+                product = normalize_product_name(product)
+                key = (product, ts)
+                if ts is not None and key not in activity.seen:
+                    activity.seen.add(key)
+                    entries.append((ts, product))
+            entries.sort(key=lambda entry: entry[0])
+            activity.times = [ts for ts, _ in entries]
+            activity.products = [product for _, product in entries]
+            activity.hydrated = True
+            return activity
+
+    def _ensure_product(self, product: str) -> Optional[_ProductActivity]:
+        with self._lock:
+            activity = self._products.get(product)
+            if activity is not None:
+                self._products.move_to_end(product)
+                if activity.hydrated or self._product_loader is None:
+                    return activity
+        if self._product_loader is None:
+            return None
+        rows = self._product_loader(product)
+        if rows is None:
+            return activity
+        with self._lock:
+            activity = self._get_or_create(self._products, product, _ProductActivity, self._max_tracked_products)
+            entries = list(zip(activity.times, activity.users))
+            for username, timestamp in rows:
+                ts = to_epoch_seconds(timestamp)
+                key = (username, ts)
+                if username and ts is not None and key not in activity.seen:
+                    activity.seen.add(key)
+                    entries.append((ts, username))
+            entries.sort()
+            activity.times = [ts for ts, _ in entries]
+            activity.users = [user for _, user in entries]
+            activity.hydrated = True
+            return activity
+
+    # ─── Window maintenance (callers hold the lock) ──────────────────────────
+    @staticmethod
+    def _get_or_create(store: OrderedDict, key: str, factory, limit: int):
+        activity = store.get(key)
+        if activity is None:
+            activity = factory()
+            store[key] = activity
+            while len(store) > limit:
+                store.popitem(last=False)
+        else:
+            store.move_to_end(key)
+        return activity
+
+
+def _insert_entry(activity, key: Tuple, ts: float, values: List, value) -> None:
+    """Insert `value` at `ts` into a timeline and its parallel list, ignoring already seen keys"""
+    if key in activity.seen:
+        return
+    activity.seen.add(key)
+    position = bisect.bisect_right(activity.times, ts)
+    activity.times.insert(position, ts)
+    values.insert(position, value)
+
+
+def _window_starts(sorted_times: List[float], ts: float, window: float) -> range:
+    """Indices of timestamps starting a window [start, start + window] that contains ts"""
+    return range(bisect.bisect_left(sorted_times, ts - window), bisect.bisect_right(sorted_times, ts))
@@ -0,0 +1,164 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+from typing import Optional
+
+from metrics import REGISTRY, Counter, get_trace_id
+
+# ─── Constants ─────────────────────────────────────────────────────────────────
+LOGGER_PREFIX = "spotcheck"
+STAGES = ("ingest", "analyze", "llm", "semantic", "behavioral", "db", "cleaning")
+DEFAULT_LOG_LEVEL = "INFO"
+DEFAULT_PAYLOAD_LIMIT = 500  # characters kept from a logged payload
+DEFAULT_PAYLOAD_SAMPLE_RATE = 0.05  # share of requests whose full payloads are logged at DEBUG
+LOG_QUEUE_SIZE = 10000
+REDACTED = "****"
+_TEXT_FORMAT = "%(levelname)s:%(name)s:%(message)s [trace_id=%(trace_id)s]"
+_SECRET_KEYS = r"(?:password|passwd|api_key|gemini_api_key|google_api_key|secret|token)"
+_REDACTION_PATTERNS = [
+    # 'key': 'value' and key="value" forms; the whole quoted value, spaces included
+    (re.compile(rf"""(?i)(\b{_SECRET_KEYS}\b['"]?\s*[:=]\s*(['"]))(?:\\.|(?!\2).)*\2"""), rf"\g<1>{REDACTED}\g<2>"),
+    # Unquoted key=value forms; a bare number after "token" is a count ("token: 20"), not a secret
+    (re.compile(rf"""(?i)(\b(?!token\b['"]?\s*[:=]\s*\d+(?:[\s,;)}}]|$)){_SECRET_KEYS}\b['"]?\s*[:=]\s*)(?!['"])[^\s,}}]+"""), rf"\g<1>{REDACTED}"),
+    # Google API keys
+    (re.compile(r"(AIza)[0-9A-Za-z_\-]{20,}"), rf"\g<1>{REDACTED}"),
+    # Credentials embedded in connection URLs
+    (re.compile(r"(://[^:/\s]+:)([^@\s]+)(?=@)"), rf"\g<1>{REDACTED}"),
+]
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+LOG_RECORDS_DROPPED = REGISTRY.register(Counter(
+    "spotcheck_log_records_dropped_total",
+    "Log records discarded because the logging queue was full"
+))
+
+
+def redact(text: str) -> str:
+    """Mask passwords, API keys and URL credentials in an already formatted message"""
+    for pattern, replacement in _REDACTION_PATTERNS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def truncate(text, limit: int = DEFAULT_PAYLOAD_LIMIT) -> str:
+    text = str(text)
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}... [{len(text) - limit} more chars]"
+
+
+class PayloadPreview:
+    """
+    Lazily serialized, truncated view of a payload for %-style log arguments.
+    json.dumps only runs if the record is actually emitted.
+    """
+
+    __slots__ = ("payload", "limit")
+
+    def __init__(self, payload, limit: int = DEFAULT_PAYLOAD_LIMIT):
+        self.payload = payload
+        self.limit = limit
+
+    def __str__(self) -> str:
+        try:
+            text = json.dumps(self.payload, default=str, ensure_ascii=False)
+        except (TypeError, ValueError):
+            text = repr(self.payload)
+        return truncate(text, self.limit)
+
+
+def should_log_payload(stage_logger: logging.Logger) -> bool:
+    """True when DEBUG is enabled for the stage and this request falls inside the payload sample"""
+    if not stage_logger.isEnabledFor(logging.DEBUG):
+        return False
+    sample_rate = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", DEFAULT_PAYLOAD_SAMPLE_RATE))
+    return sample_rate >= 1 or random.random() < sample_rate
+
+
+def get_stage_logger(stage: str) -> logging.Logger:
+    assert stage in STAGES, f"Unknown logging stage {stage!r}"
+    return logging.getLogger(f"{LOGGER_PREFIX}.{stage}")
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Never block the caller: when the queue is full the record is counted and dropped"""
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+
+class TraceIdFilter(logging.Filter):
+    """Attach the current request trace ID; runs on the caller's thread where the contextvar is set"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.trace_id = get_trace_id() or "-"
+        return True
+
+
+class RedactingFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        return redact(super().format(record))
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "trace_id": getattr(record, "trace_id", "-"),
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return redact(json.dumps(entry, ensure_ascii=False))
+
+
+def configure_logging() -> None:
+    """
+    Route all logging through a bounded queue drained by a background listener so request
+    handlers never block on log I/O. Levels come from LOG_LEVEL and LOG_LEVEL_<STAGE>
+    (e.g. LOG_LEVEL_LLM=DEBUG); LOG_FORMAT=json switches to one JSON object per line.
+    """
+    global _listener
+    if _listener is not None:
+        return
+    output_handler = logging.StreamHandler()
+    if os.getenv("LOG_FORMAT", "text").lower() == "json":
+        output_handler.setFormatter(JsonFormatter())
+    else:
+        output_handler.setFormatter(RedactingFormatter(_TEXT_FORMAT))
+
+    queue_handler = _DroppingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    queue_handler.addFilter(TraceIdFilter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(os.getenv("LOG_LEVEL", DEFAULT_LOG_LEVEL).upper())
+    for stage in STAGES:
+        level = os.getenv(f"LOG_LEVEL_{stage.upper()}")
+        if level:
+            get_stage_logger(stage).setLevel(level.upper())
+
+    _listener = logging.handlers.QueueListener(queue_handler.queue, output_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging() -> None:
+    """Flush queued records and stop the background listener"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
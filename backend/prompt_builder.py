@@ -0,0 +1,135 @@
+import math
+import os
+import re
+from typing import Dict, List, Sequence, Tuple
+
+import metrics
+
+# ─── Constants ─────────────────────────────────────────────────────────────────
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", 1500))  # system + user prompt per LLM call
+MAX_REVIEW_TOKENS = int(os.getenv("MAX_REVIEW_TOKENS", 120))  # longer reviews are cut in the middle
+CHARS_PER_TOKEN = 4  # typical for English/Malay text with BPE tokenizers
+REPEATED_CHAR_LIMIT = 3  # "sooooo gooood!!!!!" -> "sooo gooo!!!"
+ELISION = " … "
+SCORE_PRECISION = 3
+_WHITESPACE = re.compile(r"\s+")
+# Digits are left alone: "1000000 ringgit" or "20000mAh" must reach the LLM unchanged
+_REPEATED_CHAR = re.compile(r"([^\d\s])\1{%d,}" % REPEATED_CHAR_LIMIT)
+
+PROMPT_TOKENS = metrics.REGISTRY.register(metrics.Histogram(
+    "spotcheck_llm_prompt_tokens",
+    "Estimated prompt tokens sent to the LLM per request, summed over chunks",
+    ["stage"],
+    buckets=(100, 250, 500, 1000, 1500, 2500, 5000, 10000, 25000)
+))
+PROMPT_CHUNKS = metrics.REGISTRY.register(metrics.Histogram(
+    "spotcheck_llm_prompt_chunks",
+    "LLM calls needed per request to stay under PROMPT_TOKEN_BUDGET",
+    ["stage"],
+    buckets=(1, 2, 3, 5, 10, 20)
+))
+REVIEWS_COMPACTED = metrics.REGISTRY.register(metrics.Counter(
+    "spotcheck_llm_reviews_compacted_total",
+    "Reviews shortened or dropped from prompts",
+    ["reason"]
+))
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap token estimate without a tokenizer dependency. ASCII text averages about four
+    characters per token; CJK characters and emoji usually cost at least one token each.
+    """
+    if not text:
+        return 0
+    non_ascii = sum(1 for char in text if ord(char) > 127)
+    return math.ceil((len(text) - non_ascii) / CHARS_PER_TOKEN) + non_ascii
+
+
+def compact_review(text: str, max_tokens: int = MAX_REVIEW_TOKENS) -> str:
+    """Collapse whitespace and character runs, then keep the head and tail of an overlong review"""
+    text = _WHITESPACE.sub(" ", text or "").strip()
+    text = _REPEATED_CHAR.sub(lambda match: match.group(1) * REPEATED_CHAR_LIMIT, text)
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    REVIEWS_COMPACTED.inc(reason="truncated")
+    # Openings and closings carry most of the verdict signal ("Fast delivery ... will buy again")
+    chars = max_tokens * CHARS_PER_TOKEN
+    while True:
+        keep = max(2, chars - len(ELISION))
+        candidate = text[:keep - keep // 2].rstrip() + ELISION + text[len(text) - keep // 2:].lstrip()
+        tokens = estimate_tokens(candidate)
+        if tokens <= max_tokens or keep == 2:
+            return candidate
+        # Mostly non-ASCII text costs more than CHARS_PER_TOKEN; shrink proportionally
+        chars = chars * max_tokens // tokens
+
+
+class PromptChunk:
+    """Reviews for one LLM call; `indices` are positions in the caller's original comment list"""
+
+    __slots__ = ("indices", "reviews", "tokens")
+
+    def __init__(self):
+        self.indices: List[int] = []
+        self.reviews: List[str] = []
+        self.tokens = 0
+
+
+def format_review_lines(reviews: Sequence[str]) -> str:
+    """Numbered `N. Review: '...'` lines; numbering restarts at 1 for every chunk"""
+    return "".join(f"{i}. Review: '{review}'\n" for i, review in enumerate(reviews, 1))
+
+
+def pack_reviews(comments: Sequence[str], fixed_prompt: str, budget: int = PROMPT_TOKEN_BUDGET,
+                 max_review_tokens: int = MAX_REVIEW_TOKENS) -> Tuple[List[PromptChunk], Dict[int, int]]:
+    """
+    Compact reviews, send identical ones only once and pack the rest in order into chunks whose
+    estimated size, including `fixed_prompt` (system prompt, product line, caller prompt), stays
+    under `budget`. Returns the chunks and a map from each duplicate's index to the index whose
+    verdict it should reuse. A chunk always takes at least one review, so a fixed prompt larger
+    than the budget degrades to one review per call rather than failing.
+    """
+    fixed_tokens = estimate_tokens(fixed_prompt)
+    # Never cut a review below a useful length just because the fixed prompt is large
+    review_tokens = max(16, min(max_review_tokens, budget - fixed_tokens))
+    chunks: List[PromptChunk] = []
+    duplicates: Dict[int, int] = {}
+    first_seen: Dict[str, int] = {}
+    chunk = PromptChunk()
+    for index, comment in enumerate(comments):
+        # Dedupe on the whole text: two long reviews can share a head and tail after truncation
+        key = _WHITESPACE.sub(" ", comment or "").strip()
+        if key in first_seen:
+            duplicates[index] = first_seen[key]
+            REVIEWS_COMPACTED.inc(reason="duplicate")
+            continue
+        first_seen[key] = index
+        review = compact_review(comment, review_tokens)
+        line_tokens = estimate_tokens(format_review_lines([review]))
+        if chunk.reviews and fixed_tokens + chunk.tokens + line_tokens > budget:
+            chunks.append(chunk)
+            chunk = PromptChunk()
+        chunk.indices.append(index)
+        chunk.reviews.append(review)
+        chunk.tokens += line_tokens
+    if chunk.reviews:
+        chunks.append(chunk)
+    for chunk in chunks:
+        chunk.tokens += fixed_tokens
+    return chunks, duplicates
+
+
+def compact_scores(scores: Sequence[Sequence[float]]) -> List[List[float]]:
+    """Round similarity scores; full float precision only adds tokens"""
+    return [[round(score, SCORE_PRECISION) for score in row or []] for row in scores]
+
+
+def dedupe_evidence(evidence: Sequence[Sequence[str]]) -> List[List[str]]:
+    """Drop repeated evidence sentences within each review, keeping their order"""
+    return [list(dict.fromkeys(row or [])) for row in evidence]
+
+
+def record_prompt_usage(stage: str, tokens: int, chunks: int) -> None:
+    PROMPT_TOKENS.observe(tokens, stage=stage)
+    PROMPT_CHUNKS.observe(chunks, stage=stage)
@@ -0,0 +1,318 @@
+import asyncio
+import contextvars
+import itertools
+import logging
+import math
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# ─── Constants ─────────────────────────────────────────────────────────────────
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+LANES = (INTERACTIVE, BACKGROUND)  # in priority order
+MIN_RETRY_AFTER_SECONDS = 1
+DEFAULT_SERVICE_SECONDS = 5.0  # service time estimate before any job has finished
+SERVICE_TIME_SMOOTHING = 0.2
+
+QUEUE_WAIT = metrics.REGISTRY.register(metrics.Histogram(
+    "spotcheck_scheduler_queue_wait_seconds",
+    "Time LLM-bound jobs spent queued before a worker picked them up",
+    ["lane"]
+))
+REJECTED = metrics.REGISTRY.register(metrics.Counter(
+    "spotcheck_scheduler_rejected_total",
+    "Jobs refused because their lane queue was full",
+    ["lane"]
+))
+CANCELLED = metrics.REGISTRY.register(metrics.Counter(
+    "spotcheck_scheduler_cancelled_total",
+    "Queued jobs dropped because every caller went away",
+    ["lane"]
+))
+ABANDONED = metrics.REGISTRY.register(metrics.Counter(
+    "spotcheck_scheduler_abandoned_total",
+    "Running jobs whose callers went away; they finish on their worker and the result is discarded",
+    ["lane"]
+))
+QUEUE_DEPTH = metrics.REGISTRY.register(metrics.Gauge(
+    "spotcheck_scheduler_queue_depth",
+    "Jobs waiting for a worker",
+    ["lane"]
+))
+RUNNING = metrics.REGISTRY.register(metrics.Gauge(
+    "spotcheck_scheduler_running",
+    "Jobs currently running",
+    ["lane"]
+))
+COALESCED = metrics.REGISTRY.register(metrics.Counter(
+    "spotcheck_serial_runs_coalesced_total",
+    "Calls that shared a queued pass of a serial runner instead of starting their own",
+    ["runner"]
+))
+
+
+class SchedulerFull(Exception):
+    """Raised when a lane's queue is at capacity; retry_after is a whole number of seconds"""
+
+    def __init__(self, lane: str, retry_after: int):
+        super().__init__(f"{lane} queue is full, retry after {retry_after}s")
+        self.lane = lane
+        self.retry_after = retry_after
+
+
+class ClientDisconnected(Exception):
+    """The HTTP client went away before its result was ready"""
+
+
+class _Job:
+    __slots__ = ("lane", "compute", "future", "enqueued_at", "sequence", "context")
+
+    def __init__(self, lane: str, compute: Callable[[], Awaitable[Any]], future: asyncio.Future, sequence: int):
+        self.lane = lane
+        self.compute = compute
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+        self.sequence = sequence
+        # The submitter's contextvars (trace ID and friends); workers were started by whichever request came first
+        self.context = contextvars.copy_context()
+
+
+class WorkScheduler:
+    """
+    Admission-controlled scheduler for LLM-bound work.
+    Interactive jobs are always dequeued before background jobs, and background jobs may
+    occupy at most `workers - 1` workers so an interactive request never waits behind a full
+    pool of ingest analysis. With a single worker the lanes share it: interactive jobs still
+    go first, but may wait for one running background job. Each lane has a bounded queue;
+    submit() raises SchedulerFull instead of growing it. Workers start lazily on the running
+    event loop.
+    """
+
+    def __init__(self, workers: int, max_queue_depth: Dict[str, int]):
+        assert workers > 0, "workers must be positive"
+        assert set(max_queue_depth) == set(LANES), f"max_queue_depth needs limits for {LANES}"
+        self.workers = workers
+        self.max_queue_depth = dict(max_queue_depth)
+        self.background_limit = max(1, workers - 1)
+        if workers == 1:
+            logger.warning("Only one LLM worker: background jobs share it with interactive requests, "
+                           "which may wait for one running background job; set LLM_WORKERS >= 2 to reserve capacity")
+        self._service_seconds = DEFAULT_SERVICE_SECONDS
+        self._sequence = itertools.count()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._reset_state()
+        QUEUE_DEPTH.add_function(lambda: {(lane,): self.queue_depth(lane) for lane in LANES})
+        RUNNING.add_function(lambda: {(lane,): self._running[lane] for lane in LANES})
+
+    def _reset_state(self) -> None:
+        self._queues = {lane: deque() for lane in LANES}
+        self._running = {lane: 0 for lane in LANES}
+        self._condition: Optional[asyncio.Condition] = None
+        self._worker_tasks = []
+
+    def _ensure_started(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        if self._loop is not None:
+            logger.warning("Event loop changed, restarting LLM workers")
+        self._reset_state()
+        self._loop = loop
+        self._condition = asyncio.Condition()
+        self._worker_tasks = [loop.create_task(self._worker()) for _ in range(self.workers)]
+
+    # ─── Submission ──────────────────────────────────────────────────────────
+    def queue_depth(self, lane: str) -> int:
+        """Queued jobs that still have a caller; cancelled ones may sit in the queue until their callback runs"""
+        return sum(1 for job in self._queues[lane] if not job.future.cancelled())
+
+    def retry_after(self, lane: str) -> int:
+        """Estimated seconds until the lane has room, from queue depth and smoothed service time"""
+        capacity = self.workers if lane == INTERACTIVE else self.background_limit
+        ahead = self.queue_depth(INTERACTIVE) + (self.queue_depth(BACKGROUND) if lane == BACKGROUND else 0)
+        return max(MIN_RETRY_AFTER_SECONDS, math.ceil(ahead * self._service_seconds / capacity))
+
+    async def submit(self, lane: str, compute: Callable[[], Awaitable[Any]]) -> asyncio.Future:
+        """
+        Queue a job and return a future for its result. Cancelling the future drops the job while
+        it is queued; once running it completes on its worker and the result is discarded.
+        """
+        assert lane in LANES, f"Unknown lane {lane!r}"
+        self._ensure_started()
+        if self.queue_depth(lane) >= self.max_queue_depth[lane]:
+            REJECTED.inc(lane=lane)
+            raise SchedulerFull(lane, self.retry_after(lane))
+        future = self._loop.create_future()
+        job = _Job(lane, compute, future, next(self._sequence))
+        future.add_done_callback(lambda done: self._discard(job) if done.cancelled() else None)
+        async with self._condition:
+            self._queues[lane].append(job)
+            self._condition.notify()
+        return future
+
+    def _discard(self, job: _Job) -> None:
+        """Drop a cancelled job from anywhere in its queue so it stops holding queue capacity"""
+        try:
+            self._queues[job.lane].remove(job)
+        except ValueError:
+            return  # already picked up by a worker, or removed by _next_job
+        CANCELLED.inc(lane=job.lane)
+
+    async def run(self, lane: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """Submit and wait; if the caller is cancelled the job is abandoned (see submit)"""
+        future = await self.submit(lane, compute)
+        try:
+            return await future
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+
+    # ─── Workers ─────────────────────────────────────────────────────────────
+    def _next_job(self) -> Optional[_Job]:
+        for lane in LANES:
+            queue = self._queues[lane]
+            while queue and queue[0].future.cancelled():
+                CANCELLED.inc(lane=lane)
+                queue.popleft()
+            if not queue:
+                continue
+            if lane == BACKGROUND and self._running[BACKGROUND] >= self.background_limit:
+                continue
+            return queue.popleft()
+        return None
+
+    async def _worker(self) -> None:
+        while True:
+            async with self._condition:
+                job = self._next_job()
+                while job is None:
+                    await self._condition.wait()
+                    job = self._next_job()
+                self._running[job.lane] += 1
+            try:
+                await self._execute(job)
+            finally:
+                async with self._condition:
+                    self._running[job.lane] -= 1
+                    self._condition.notify_all()
+
+    async def _execute(self, job: _Job) -> None:
+        QUEUE_WAIT.observe(time.perf_counter() - job.enqueued_at, lane=job.lane)
+        # Running jobs are not cancelled when their caller goes away: the blocking LLM and DB calls
+        # underneath run in threads that cancellation cannot stop, so the worker keeps its slot until
+        # they return. Otherwise abandoned calls would pile up beyond the worker limit.
+        # Created inside the submitter's context so logs and stage timings carry its trace ID;
+        # equivalent to create_task(..., context=job.context) on Python 3.11+
+        task = job.context.run(self._loop.create_task, job.compute())
+        started = time.perf_counter()
+        try:
+            result = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if task.cancelled():
+                job.future.cancel()
+                return
+            # The worker itself is being stopped
+            task.cancel()
+            raise
+        except Exception as e:
+            if not job.future.done():
+                job.future.set_exception(e)
+            return
+        self._service_seconds += SERVICE_TIME_SMOOTHING * ((time.perf_counter() - started) - self._service_seconds)
+        if job.future.cancelled():
+            ABANDONED.inc(lane=job.lane)
+        elif not job.future.done():
+            job.future.set_result(result)
+
+    async def stop(self) -> None:
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        for lane in LANES:
+            for job in self._queues[lane]:
+                job.future.cancel()
+        self._loop = None
+        self._reset_state()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {lane: {"queued": self.queue_depth(lane), "running": self._running[lane]} for lane in LANES}
+
+
+class SerialRunner:
+    """
+    Runs a blocking function one pass at a time on its own thread, off the default executor that
+    LLM and DB calls share. A call arriving while a pass runs waits for the next pass, and all
+    such calls share that single pass, so a burst of callers costs at most two passes.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+        self._running: Optional[asyncio.Future] = None
+        self._next: Optional[asyncio.Future] = None
+        self._next_call = None
+
+    async def run(self, func: Callable[..., Any], *args) -> Any:
+        """Run func(*args), or join the pass queued behind the running one"""
+        if self._running is not None and self._running.get_loop() is not asyncio.get_running_loop():
+            # A previous event loop went away mid-pass; its futures can never complete here
+            self._running, self._next, self._next_call = None, None, None
+        if self._running is None:
+            self._running = self._start(func, args)
+            future = self._running
+        else:
+            if self._next is None:
+                self._next = asyncio.get_running_loop().create_future()
+            else:
+                COALESCED.inc(runner=self.name)
+            # The running pass may have missed this caller's data; the next pass uses the latest arguments
+            self._next_call = (func, args)
+            future = self._next
+        return await asyncio.shield(future)
+
+    def _start(self, func: Callable[..., Any], args: tuple) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, contextvars.copy_context().run, func, *args)
+        future.add_done_callback(self._finished)
+        return future
+
+    def _finished(self, _done: asyncio.Future) -> None:
+        waiting, call = self._next, self._next_call
+        self._next, self._next_call = None, None
+        if waiting is None:
+            self._running = None
+            return
+        self._running = self._start(*call)
+        self._running.add_done_callback(lambda done: _copy_outcome(done, waiting))
+
+def _copy_outcome(source: asyncio.Future, target: asyncio.Future) -> None:
+    if target.done():
+        return
+    if source.cancelled():
+        target.cancel()
+    elif source.exception() is not None:
+        target.set_exception(source.exception())
+    else:
+        target.set_result(source.result())
+
+
+async def run_until_disconnected(request, awaitable: Awaitable[Any], poll_seconds: float) -> Any:
+    """Await `awaitable`, cancelling it and raising ClientDisconnected if the HTTP client goes away"""
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_seconds)
+            if done:
+                return task.result()
+            if request is not None and await request.is_disconnected():
+                task.cancel()
+                raise ClientDisconnected()
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
@@ -0,0 +1,431 @@
+import argparse
+import datetime
+import logging
+import os
+import re
+from typing import Iterable, List, Optional, Set
+
+import psycopg2
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+# ─── Constants ─────────────────────────────────────────────────────────────────
+EMBEDDING_DIMENSIONS = 384  # all-MiniLM-L6-v2
+MIGRATION_BATCH_SIZE = 50000
+DEFAULT_RETENTION_MONTHS = 24
+DEFAULT_COMPACT_MONTHS = 3
+ARCHIVE_SCHEMA = "archive"
+LEGACY_SUFFIX = "_legacy"
+_PARTITION_SUFFIX_PATTERN = re.compile(r"_p(\d{4})(\d{2})$")
+_REVIEW_COLUMNS = "id, comment, username, rating, source, product, page_timestamp, embedding"
+# Indexes used by behavioral queries and burst detection: (name suffix, index definition)
+_INDEX_DEFINITIONS = [
+    # Equality lookups on comment text (duplicate/multi-user/multi-product checks)
+    ("comment_hash_idx", "USING hash (comment)"),
+    ("username_ts_idx", "(username, page_timestamp)"),
+    ("product_ts_idx", "(product, page_timestamp)"),
+]
+
+# Partitions already known to exist in this process, so ingest does not issue DDL on every request
+_known_partitions: Set[str] = set()
+
+
+def month_start(value: datetime.datetime) -> datetime.date:
+    return datetime.date(value.year, value.month, 1)
+
+
+def next_month(value: datetime.date) -> datetime.date:
+    return datetime.date(value.year + (value.month // 12), value.month % 12 + 1, 1)
+
+
+def partition_name(table_name: str, month: datetime.date) -> str:
+    return f"{table_name}_p{month.year:04d}{month.month:02d}"
+
+
+def default_partition_name(table_name: str) -> str:
+    return f"{table_name}_default"
+
+
+def is_partitioned(cursor, table_name: str) -> Optional[bool]:
+    """True if the table is partitioned, False if it is a plain table, None if it does not exist"""
+    cursor.execute(
+        """
+        SELECT c.relkind
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE c.relname = %s AND n.nspname = current_schema()
+        """,
+        (table_name,)
+    )
+    row = cursor.fetchone()
+    if not row:
+        return None
+    return row[0] == "p"
+
+
+def create_partitioned_table(cursor, table_name: str) -> List[str]:
+    """
+    Create the review table partitioned by month of page_timestamp, with its supporting indexes
+    and the upcoming monthly partitions; returns their names for commit_partitions
+    """
+    cursor.execute("CREATE EXTENSION IF NOT EXISTS vector;")
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {table_name} (
+            id BIGSERIAL,
+            comment TEXT,
+            username TEXT,
+            rating INTEGER,
+            source TEXT,
+            product TEXT,
+            page_timestamp TIMESTAMP NOT NULL,
+            embedding vector({EMBEDDING_DIMENSIONS}),
+            comment_hash TEXT GENERATED ALWAYS AS (md5(comment)) STORED,
+            PRIMARY KEY (id, page_timestamp),
+            UNIQUE (username, product, page_timestamp, comment_hash)
+        ) PARTITION BY RANGE (page_timestamp);
+    """)
+    cursor.execute(f"CREATE TABLE IF NOT EXISTS {default_partition_name(table_name)} PARTITION OF {table_name} DEFAULT;")
+    ensure_indexes(cursor, table_name)
+    return ensure_upcoming_partitions(cursor, table_name)
+
+
+def ensure_indexes(cursor, table_name: str) -> None:
+    """
+    Create the lookup indexes on a partitioned table; they cascade to every partition.
+    Plain tables go through build_indexes_concurrently instead, since a plain CREATE INDEX
+    blocks writes for the whole build.
+    """
+    for suffix, definition in _INDEX_DEFINITIONS:
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {table_name}_{suffix} ON {table_name} {definition};")
+
+
+def missing_indexes(cursor, table_name: str) -> List[str]:
+    """Lookup indexes that are absent or left invalid by an interrupted concurrent build"""
+    names = [f"{table_name}_{suffix}" for suffix, _ in _INDEX_DEFINITIONS]
+    cursor.execute(
+        """
+        SELECT c.relname
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = current_schema() AND i.indisvalid AND c.relname = ANY(%s)
+        """,
+        (names,)
+    )
+    valid = {row[0] for row in cursor.fetchall()}
+    return [name for name in names if name not in valid]
+
+
+def build_indexes_concurrently(conn, table_name: str) -> List[str]:
+    """Build missing lookup indexes on a plain table with CREATE INDEX CONCURRENTLY, so ingest keeps writing"""
+    cursor = conn.cursor()
+    missing = set(missing_indexes(cursor, table_name))
+    conn.commit()
+    previous_autocommit = conn.autocommit
+    conn.autocommit = True  # CONCURRENTLY cannot run inside a transaction block
+    built = []
+    try:
+        for suffix, definition in _INDEX_DEFINITIONS:
+            name = f"{table_name}_{suffix}"
+            if name not in missing:
+                continue
+            # An interrupted concurrent build leaves an invalid index that IF NOT EXISTS would keep
+            cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name};")
+            cursor.execute(f"CREATE INDEX CONCURRENTLY {name} ON {table_name} {definition};")
+            built.append(name)
+            logger.info("Built index %s", name)
+    finally:
+        conn.autocommit = previous_autocommit
+        cursor.close()
+    return built
+
+
+def ensure_partitions(cursor, table_name: str, timestamps: Iterable) -> List[str]:
+    """
+    Create monthly partitions covering the given page_timestamps in the cursor's transaction.
+    Returns the partition names checked; pass them to commit_partitions so they are cached only
+    once the transaction has committed, and retried by the next call after a rollback.
+    """
+    months = set()
+    for timestamp in timestamps:
+        if isinstance(timestamp, str):
+            try:
+                timestamp = datetime.datetime.strptime(timestamp.strip()[:16], "%Y-%m-%d %H:%M")
+            except ValueError:
+                continue
+        if isinstance(timestamp, datetime.datetime):
+            months.add(month_start(timestamp))
+    checked = []
+    for month in sorted(months):
+        name = partition_name(table_name, month)
+        if name in _known_partitions:
+            continue
+        if create_month_partition(cursor, table_name, month):
+            logger.info("Created partition %s", name)
+        checked.append(name)
+    return checked
+
+
+def commit_partitions(conn, names: Iterable[str]) -> None:
+    """Commit the transaction that ensured `names` and only then remember them as existing"""
+    conn.commit()
+    _known_partitions.update(names)
+
+
+def ensure_upcoming_partitions(cursor, table_name: str) -> List[str]:
+    """Pre-create this month's and next month's partitions so in-range rows never land in the default partition"""
+    this_month = month_start(datetime.datetime.now())
+    upcoming = next_month(this_month)
+    return ensure_partitions(cursor, table_name, [
+        datetime.datetime(this_month.year, this_month.month, 1),
+        datetime.datetime(upcoming.year, upcoming.month, 1),
+    ])
+
+
+def create_month_partition(cursor, table_name: str, month: datetime.date) -> bool:
+    """
+    Create the partition for one month; returns False if it already existed.
+    Postgres refuses to create a range partition while the default partition holds rows in that
+    range, which happens after a failed partition creation or when ingest ran during a migration.
+    Those rows are moved out: detach the default, create the month, move the rows, reattach.
+    The caller's transaction makes the whole swap atomic.
+    """
+    name = partition_name(table_name, month)
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL, to_regclass(%s) IS NOT NULL;", (name, default_partition_name(table_name)))
+    exists, has_default = cursor.fetchone()
+    if exists:
+        return False
+    bounds = (month, next_month(month))
+    default = default_partition_name(table_name)
+    stranded = False
+    if has_default:
+        cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {default} WHERE page_timestamp >= %s AND page_timestamp < %s);", bounds)
+        stranded = cursor.fetchone()[0]
+    if not stranded:
+        cursor.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table_name}
+            FOR VALUES FROM (%s) TO (%s);
+            """,
+            bounds
+        )
+        return True
+    cursor.execute(f"ALTER TABLE {table_name} DETACH PARTITION {default};")
+    cursor.execute(f"CREATE TABLE {name} PARTITION OF {table_name} FOR VALUES FROM (%s) TO (%s);", bounds)
+    cursor.execute(
+        f"""
+        WITH moved AS (
+            DELETE FROM {default}
+            WHERE page_timestamp >= %s AND page_timestamp < %s
+            RETURNING {_REVIEW_COLUMNS}
+        )
+        INSERT INTO {table_name} ({_REVIEW_COLUMNS})
+        SELECT {_REVIEW_COLUMNS} FROM moved;
+        """,
+        bounds
+    )
+    moved = cursor.rowcount
+    cursor.execute(f"ALTER TABLE {table_name} ATTACH PARTITION {default} DEFAULT;")
+    logger.info("Created partition %s and moved %s rows out of %s", name, moved, default)
+    return True
+
+
+def list_partitions(cursor, table_name: str) -> List[str]:
+    cursor.execute(
+        """
+        SELECT child.relname
+        FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname = %s
+        ORDER BY child.relname
+        """,
+        (table_name,)
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+
+def migrate_to_partitioned(conn, table_name: str, batch_size: int = MIGRATION_BATCH_SIZE) -> int:
+    """
+    Move an existing plain review table into the partitioned layout.
+    The swap happens in one short transaction so ingest can continue against the new table
+    (a running backend notices the switch on its next ingest and starts creating monthly
+    partitions); rows are then copied from <table>_legacy in id-ordered batches. The legacy
+    table is kept.
+    """
+    cursor = conn.cursor()
+    state = is_partitioned(cursor, table_name)
+    if state is None:
+        commit_partitions(conn, create_partitioned_table(cursor, table_name))
+        logger.info("Created partitioned table %s", table_name)
+        return 0
+    legacy_name = f"{table_name}{LEGACY_SUFFIX}"
+    if state is False:
+        cursor.execute(f"ALTER TABLE {table_name} RENAME TO {legacy_name};")
+        # Index and constraint names are schema-wide, free them for the new table
+        cursor.execute("SELECT indexname FROM pg_indexes WHERE tablename = %s AND schemaname = current_schema()", (legacy_name,))
+        for (index_name,) in cursor.fetchall():
+            if not index_name.endswith(LEGACY_SUFFIX):
+                cursor.execute(f"ALTER INDEX {index_name} RENAME TO {index_name}{LEGACY_SUFFIX};")
+        upcoming = create_partitioned_table(cursor, table_name)
+        cursor.execute(f"SELECT COALESCE(MAX(id), 0) FROM {legacy_name};")
+        max_id = cursor.fetchone()[0]
+        cursor.execute("SELECT setval(pg_get_serial_sequence(%s, 'id'), %s + 1, false);", (table_name, max_id))
+        commit_partitions(conn, upcoming)
+        logger.info("Renamed %s to %s and created partitioned table", table_name, legacy_name)
+    elif is_partitioned(cursor, legacy_name) is None:
+        logger.info("%s is already partitioned, nothing to migrate", table_name)
+        return 0
+
+    cursor.execute(f"SELECT DISTINCT date_trunc('month', page_timestamp) FROM {legacy_name} WHERE page_timestamp IS NOT NULL;")
+    legacy_months = ensure_partitions(cursor, table_name, [row[0] for row in cursor.fetchall()])
+    cursor.execute(f"SELECT COUNT(*) FROM {legacy_name} WHERE page_timestamp IS NULL;")
+    skipped = cursor.fetchone()[0]
+    if skipped:
+        logger.warning("Skipping %s legacy rows without page_timestamp; they stay in %s", skipped, legacy_name)
+    commit_partitions(conn, legacy_months)
+
+    copied, last_id = 0, 0
+    while True:
+        cursor.execute(
+            f"""
+            WITH batch AS (
+                SELECT {_REVIEW_COLUMNS}
+                FROM {legacy_name}
+                WHERE id > %s AND page_timestamp IS NOT NULL
+                ORDER BY id
+                LIMIT %s
+            ), inserted AS (
+                INSERT INTO {table_name} ({_REVIEW_COLUMNS})
+                SELECT {_REVIEW_COLUMNS} FROM batch
+                ON CONFLICT DO NOTHING
+                RETURNING 1
+            )
+            SELECT (SELECT MAX(id) FROM batch), (SELECT COUNT(*) FROM inserted);
+            """,
+            (last_id, batch_size)
+        )
+        batch_max_id, inserted = cursor.fetchone()
+        conn.commit()
+        if batch_max_id is None:
+            break
+        last_id = batch_max_id
+        copied += inserted
+        logger.info("Migrated %s rows into %s (last id %s)", copied, table_name, last_id)
+    cursor.close()
+    return copied
+
+
+def archive_old_partitions(conn, table_name: str, retention_months: int = DEFAULT_RETENTION_MONTHS, drop: bool = False) -> List[str]:
+    """Detach monthly partitions older than the retention window and move them to the archive schema (or drop them)"""
+    assert retention_months > 0, "retention_months must be positive"
+    cutoff = month_start(datetime.datetime.now())
+    for _ in range(retention_months):
+        cutoff = datetime.date(cutoff.year - (cutoff.month == 1), (cutoff.month - 2) % 12 + 1, 1)
+    cursor = conn.cursor()
+    archived = []
+    for name in list_partitions(cursor, table_name):
+        match = _PARTITION_SUFFIX_PATTERN.search(name)
+        if not match:
+            continue
+        if datetime.date(int(match.group(1)), int(match.group(2)), 1) >= cutoff:
+            continue
+        cursor.execute(f"ALTER TABLE {table_name} DETACH PARTITION {name};")
+        if drop:
+            cursor.execute(f"DROP TABLE {name};")
+        else:
+            cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA};")
+            cursor.execute(f"ALTER TABLE {name} SET SCHEMA {ARCHIVE_SCHEMA};")
+        conn.commit()
+        _known_partitions.discard(name)
+        archived.append(name)
+        logger.info("%s partition %s", "Dropped" if drop else "Archived", name)
+    cursor.close()
+    return archived
+
+
+def compact_recent_partitions(conn, table_name: str, months: int = DEFAULT_COMPACT_MONTHS) -> List[str]:
+    """VACUUM ANALYZE the default partition and the most recent monthly partitions; cold months are left alone"""
+    cursor = conn.cursor()
+    partitions = list_partitions(cursor, table_name)
+    monthly = [name for name in partitions if _PARTITION_SUFFIX_PATTERN.search(name)]
+    targets = [name for name in partitions if name not in monthly] + monthly[-months:]
+    conn.commit()
+    previous_autocommit = conn.autocommit
+    conn.autocommit = True  # VACUUM cannot run inside a transaction block
+    try:
+        for name in targets:
+            cursor.execute(f"VACUUM (ANALYZE) {name};")
+            logger.info("Compacted partition %s", name)
+    finally:
+        conn.autocommit = previous_autocommit
+        cursor.close()
+    return targets
+
+
+def prepare_review_table(conn, table_name: str) -> Optional[bool]:
+    """Startup check: create the partitioned table if missing; indexes are ensured on partitioned tables only"""
+    cursor = conn.cursor()
+    state = is_partitioned(cursor, table_name)
+    ensured: List[str] = []
+    if state is None:
+        ensured = create_partitioned_table(cursor, table_name)
+        state = True
+        logger.info("Created partitioned table %s", table_name)
+    elif state:
+        ensure_indexes(cursor, table_name)
+        _known_partitions.update(list_partitions(cursor, table_name))
+        ensured = ensure_upcoming_partitions(cursor, table_name)
+    else:
+        logger.warning("%s is not partitioned; run 'python backend/schema.py migrate' to convert it", table_name)
+        # Building indexes here would block writes on a large table at every first startup
+        missing = missing_indexes(cursor, table_name)
+        if missing:
+            logger.warning("%s is missing indexes %s; run 'python backend/schema.py index' to build them without blocking writes", table_name, missing)
+    commit_partitions(conn, ensured)
+    cursor.close()
+    return state
+
+
+def main():
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Manage the product_reviews storage layout")
+    parser.add_argument("command", choices=["create", "migrate", "index", "archive", "compact"])
+    parser.add_argument("--table", default=os.getenv("TABLE_NAME"))
+    parser.add_argument("--batch-size", type=int, default=MIGRATION_BATCH_SIZE)
+    parser.add_argument("--retention-months", type=int, default=DEFAULT_RETENTION_MONTHS)
+    parser.add_argument("--compact-months", type=int, default=DEFAULT_COMPACT_MONTHS)
+    parser.add_argument("--drop", action="store_true", help="Drop expired partitions instead of archiving them")
+    args = parser.parse_args()
+    if not args.table:
+        parser.error("TABLE_NAME is not set; pass --table")
+
+    conn = psycopg2.connect(
+        dbname=os.getenv("DBNAME"),
+        user=os.getenv("DB_USER"),
+        password=os.getenv("PASSWORD"),
+        host=os.getenv("HOST"),
+        port=int(os.getenv("PORT", 5432))
+    )
+    try:
+        if args.command == "create":
+            prepare_review_table(conn, args.table)
+        elif args.command == "migrate":
+            migrate_to_partitioned(conn, args.table, args.batch_size)
+        elif args.command == "index":
+            if is_partitioned(conn.cursor(), args.table) is not False:
+                prepare_review_table(conn, args.table)
+            else:
+                build_indexes_concurrently(conn, args.table)
+        elif args.command == "archive":
+            archive_old_partitions(conn, args.table, args.retention_months, args.drop)
+        elif args.command == "compact":
+            compact_recent_partitions(conn, args.table, args.compact_months)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+# Outcomes reported by SingleFlight.do
+CACHE_HIT = "hit"
+JOINED = "joined"
+LEADER = "leader"
+
+
+def request_key(**parts) -> str:
+    """Stable SHA-256 over the JSON encoding of the request fields that determine the response"""
+    encoded = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls with the same key onto one in-flight computation and keeps
+    successful results for a short TTL. The computation runs in its own task, so a caller
+    that goes away does not cancel it for the others; it is cancelled only when every
+    waiter has gone.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int, should_cache: Optional[Callable[[Any], bool]] = None):
+        assert ttl_seconds >= 0 and max_entries > 0, "ttl_seconds must be >= 0 and max_entries > 0"
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._should_cache = should_cache or (lambda value: True)
+        self._cache: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[str, _Flight] = {}
+
+    async def do(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Tuple[Any, str]:
+        """Return (value, outcome) where outcome is CACHE_HIT, JOINED or LEADER"""
+        cached = self._get_cached(key)
+        if cached is not None:
+            return cached[1], CACHE_HIT
+
+        flight = self._inflight.get(key)
+        outcome = JOINED
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(compute()))
+            self._inflight[key] = flight
+            flight.task.add_done_callback(lambda task: self._finish(key, task))
+            outcome = LEADER
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task), outcome
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+
+    def _finish(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is not None and self._inflight[key].task is task:
+            del self._inflight[key]
+        if task.cancelled() or task.exception() is not None or self.ttl_seconds == 0:
+            return
+        value = task.result()
+        if self._should_cache(value):
+            self._cache[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def _get_cached(self, key: str) -> Optional[Tuple[float, Any]]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self._cache[key]
+            return None
+        return entry
+
+    def stats(self) -> Dict[str, int]:
+        return {"cached": len(self._cache), "in_flight": len(self._inflight)}
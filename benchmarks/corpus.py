@@ -0,0 +1,82 @@
+import datetime
+import random
+from typing import Dict, Iterator, List, Tuple
+
+# ─── Constants ─────────────────────────────────────────────────────────────────
+DEFAULT_SEED = 1234
+PRODUCT_COUNT = 2000
+USERNAME_POOL = 200000
+TEMPLATE_RATIO = 0.15  # share of reviews reusing a generic template (copy-paste spam)
+BURST_RATIO = 0.02  # share of reviews written by burst accounts within minutes of each other
+CORPUS_START = datetime.datetime(2023, 1, 1)
+CORPUS_SPAN_DAYS = 730
+SOURCE = "benchmark"
+
+_OPENERS = ["Barang sampai", "Item arrived", "Received the shirt", "Fabric is", "Delivery was", "Seller replied", "Size fits", "Colour looks"]
+_DETAILS = ["fast and well packed", "soft and thick", "exactly like the photo", "a bit loose at the shoulders",
+            "slightly different shade", "within two days", "with no loose threads", "true to size chart",
+            "smells new", "stitching is neat", "material breathable for hot weather", "zip works smoothly"]
+_CLOSERS = ["Will buy again.", "Recommended.", "Worth the price.", "Thanks seller!", "Ok la.", "Satisfied.", "Not bad for the price.", ""]
+_TEMPLATES = [
+    "Item arrived fast. Quality is good. Will buy again.",
+    "Very good product, cheap and premium quality, must buy!!!",
+    "Best seller, fast delivery, highly recommended.",
+    "Good quality good price good service.",
+    "jden mmg terbaik xpremium",
+]
+
+
+def _product_name(index: int) -> str:
+    return f"Benchmark Shirt Model {index:05d}"
+
+
+def _free_text(rng: random.Random) -> str:
+    return f"{rng.choice(_OPENERS)} {rng.choice(_DETAILS)}, {rng.choice(_DETAILS)}. {rng.choice(_CLOSERS)}".strip()
+
+
+def generate_reviews(rows: int, seed: int = DEFAULT_SEED) -> Iterator[Tuple]:
+    """
+    Stream synthetic reviews shaped like the ingest insert:
+    (comment, username, rating, source, product, page_timestamp).
+    Deterministic for a given seed so runs are comparable.
+    """
+    rng = random.Random(seed)
+    span_minutes = CORPUS_SPAN_DAYS * 24 * 60
+    burst_anchor = None
+    for index in range(rows):
+        product = _product_name(rng.randrange(PRODUCT_COUNT))
+        roll = rng.random()
+        if roll < BURST_RATIO:
+            if burst_anchor is None or rng.random() < 0.1:
+                burst_anchor = (product, rng.randrange(span_minutes))
+            product, minute = burst_anchor[0], burst_anchor[1] + rng.randrange(10)
+            username = f"burst_{rng.randrange(500):03d}"
+            comment = rng.choice(_TEMPLATES)
+            rating = 5
+        else:
+            minute = rng.randrange(span_minutes)
+            username = f"user_{rng.randrange(USERNAME_POOL):06d}"
+            comment = rng.choice(_TEMPLATES) if roll < BURST_RATIO + TEMPLATE_RATIO else _free_text(rng)
+            rating = rng.choices([1, 2, 3, 4, 5], weights=[3, 3, 10, 30, 54])[0]
+        timestamp = CORPUS_START + datetime.timedelta(minutes=minute)
+        yield (comment, username, rating, SOURCE, product, timestamp.strftime("%Y-%m-%d %H:%M"))
+
+
+def sample_page(rng: random.Random, size: int) -> Dict[str, List]:
+    """One scraped product page as the extension posts it to /comments and /analyze"""
+    product = _product_name(rng.randrange(PRODUCT_COUNT))
+    metadata = []
+    for comment, username, rating, source, _product, timestamp in generate_reviews(size, seed=rng.randrange(1 << 30)):
+        metadata.append({
+            "comment": comment,
+            "username": username,
+            "rating": rating,
+            "source": source,
+            "product": product,
+            "timestamp": timestamp,
+        })
+    return {
+        "comments": [item["comment"] for item in metadata],
+        "metadata": metadata,
+        "product": product,
+    }
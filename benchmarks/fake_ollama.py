@@ -0,0 +1,117 @@
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ─── Constants ─────────────────────────────────────────────────────────────────
+DEFAULT_PORT = 11435
+DEFAULT_LATENCY_MS = 800
+DEFAULT_JITTER_MS = 200
+DEFAULT_SUSPICIOUS_RATIO = 0.3
+_REVIEW_LINE = re.compile(r"^\s*\d+\.\s*Review:", re.MULTILINE)
+_SEMANTIC_LINE = re.compile(r"^Semantic:\s*(.*)$", re.MULTILINE)
+
+
+def _first_pass_response(prompt: str, suspicious_ratio: float) -> str:
+    """Numbered verdict list in the format analyze_comments_batch_ollama parses"""
+    lines = []
+    for index, match in enumerate(_REVIEW_LINE.finditer(prompt), 1):
+        line_end = prompt.find("\n", match.end())
+        review = prompt[match.end():line_end if line_end != -1 else None]
+        # crc32 rather than hash() so verdicts are stable across processes
+        if (zlib.crc32(review.encode()) % 1000) / 1000 < suspicious_ratio:
+            lines.append(f"{index}. Suspicious: Generic wording with no product details.")
+        else:
+            lines.append(f"{index}. Genuine: Mentions specific fit and fabric details.")
+    return "\n".join(lines)
+
+
+def _second_pass_response(prompt: str) -> str:
+    """Verdict and explanation lists in the format determine_review_genuinty parses"""
+    match = _SEMANTIC_LINE.search(prompt)
+    try:
+        count = len(json.loads(match.group(1))) if match else 0
+    except ValueError:
+        count = 0
+    verdicts = ["Fake"] * count
+    explanations = ["This review is fake because the same text appears across many accounts."] * count
+    return json.dumps(verdicts).replace('"', "'") + "\n" + json.dumps(explanations).replace('"', "'")
+
+
+class FakeOllamaServer(ThreadingHTTPServer):
+    """Answers POST /api/generate like Ollama with stream=False, after a configurable delay"""
+
+    daemon_threads = True
+
+    def __init__(self, port: int, latency_ms: float, jitter_ms: float, suspicious_ratio: float, seed: int = 0):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.suspicious_ratio = suspicious_ratio
+        self.requests_served = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def next_delay(self) -> float:
+        with self._lock:
+            self.requests_served += 1
+            jitter = self._rng.uniform(-self.jitter_ms, self.jitter_ms)
+        return max(0.0, self.latency_ms + jitter) / 1000
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/api/generate"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: FakeOllamaServer
+
+    def do_POST(self):
+        if self.path != "/api/generate":
+            self.send_error(404)
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        prompt = body.get("prompt", "")
+        time.sleep(self.server.next_delay())
+        if _SEMANTIC_LINE.search(prompt):
+            text = _second_pass_response(prompt)
+        else:
+            text = _first_pass_response(prompt, self.server.suspicious_ratio)
+        payload = json.dumps({
+            "model": body.get("model"),
+            "response": text,
+            "done": True,
+            "prompt_eval_count": len(prompt) // 4,
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_fake_ollama(port: int = DEFAULT_PORT, latency_ms: float = DEFAULT_LATENCY_MS, jitter_ms: float = DEFAULT_JITTER_MS,
+                      suspicious_ratio: float = DEFAULT_SUSPICIOUS_RATIO) -> FakeOllamaServer:
+    """Start the fake server on a daemon thread and return it; call shutdown() when done"""
+    server = FakeOllamaServer(port, latency_ms, jitter_ms, suspicious_ratio)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Ollama /api/generate server for benchmarks")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--latency-ms", type=float, default=DEFAULT_LATENCY_MS)
+    parser.add_argument("--jitter-ms", type=float, default=DEFAULT_JITTER_MS)
+    parser.add_argument("--suspicious-ratio", type=float, default=DEFAULT_SUSPICIOUS_RATIO)
+    args = parser.parse_args()
+    server = FakeOllamaServer(args.port, args.latency_ms, args.jitter_ms, args.suspicious_ratio)
+    print(f"Fake Ollama listening on {server.url}")
+    server.serve_forever()
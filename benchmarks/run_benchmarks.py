@@ -0,0 +1,371 @@
+"""
+Reproducible benchmarks for the SpotCheck backend.
+
+Runs ingest (/comments), analyze (/analyze), embed (/embed) and embedding backfill
+(clean_postgresql_data) against a local Postgres+pgvector and a fake Ollama server,
+and writes throughput and p50/p95/p99 latencies to a JSON file that can be compared across runs.
+
+    docker run -d --name spotcheck-bench -e POSTGRES_PASSWORD=postgres -e POSTGRES_DB=spotcheck_bench \\
+        -p 5433:5432 pgvector/pgvector:pg16
+    python benchmarks/run_benchmarks.py --rows 100000 --fresh
+    python benchmarks/run_benchmarks.py --rows 0 --baseline benchmarks/results/<previous>.json
+"""
+import argparse
+import asyncio
+import datetime
+import io
+import json
+import logging
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+from corpus import DEFAULT_SEED, generate_reviews, sample_page
+from fake_ollama import DEFAULT_JITTER_MS, DEFAULT_LATENCY_MS, DEFAULT_PORT, start_fake_ollama
+
+# ─── Constants ─────────────────────────────────────────────────────────────────
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND_DIR = os.path.join(REPO_ROOT, "backend")
+RESULTS_DIR = os.path.join(REPO_ROOT, "benchmarks", "results")
+BENCH_TABLE = "product_reviews"  # backend.py inserts and searches this table by name
+SCENARIOS = ("ingest", "analyze", "embed", "backfill")
+SEED_CHUNK_ROWS = 20000
+EMBEDDING_POOL_SIZE = 1000
+EMBEDDING_DIMENSIONS = 384
+LOCAL_HOSTS = {"127.0.0.1", "localhost", "::1"}
+UNREACHABLE_DB_PORT = 1  # connection refused immediately when running without a database
+
+logger = logging.getLogger("benchmarks")
+
+
+# ─── Statistics ────────────────────────────────────────────────────────────────
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = min(max(1, math.ceil(pct * len(sorted_values) / 100)), len(sorted_values))
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies: List[float], items: int, wall_seconds: float, unit: str) -> Dict:
+    ordered = sorted(latencies)
+    return {
+        "requests": len(ordered),
+        "items": items,
+        "unit": unit,
+        "wall_seconds": round(wall_seconds, 4),
+        "throughput_per_s": round(items / wall_seconds, 3) if wall_seconds > 0 else None,
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3) if ordered else None,
+        "p50_ms": round(percentile(ordered, 50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3) if ordered else None,
+    }
+
+
+async def run_timed(make_call, requests: int, concurrency: int) -> Tuple[List[float], float]:
+    """Run make_call(i) `requests` times with bounded concurrency; returns per-call latencies and wall time"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(index):
+        async with semaphore:
+            start = time.perf_counter()
+            await make_call(index)
+            latencies.append(time.perf_counter() - start)
+
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(one(index) for index in range(requests)))
+    return latencies, time.perf_counter() - wall_start
+
+
+# ─── Environment ──────────────────────────────────────────────────────────────
+def configure_environment(args, ollama_url: str) -> None:
+    """Point the backend at the benchmark database and fake LLM before it is imported"""
+    os.environ["DBNAME"] = args.db_name
+    os.environ["DB_USER"] = args.db_user
+    os.environ["PASSWORD"] = args.db_password
+    os.environ["HOST"] = args.db_host
+    os.environ["PORT"] = str(UNREACHABLE_DB_PORT if args.no_db else args.db_port)
+    os.environ["TABLE_NAME"] = BENCH_TABLE
+    os.environ["OLLAMA_URL"] = ollama_url
+    os.environ.setdefault("LLM_MODEL", "benchmark-model")
+
+
+def load_backend(log_level: str):
+    sys.path.insert(0, BACKEND_DIR)
+    import backend
+    logging.getLogger().setLevel(log_level)
+    return backend
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+
+# ─── Seeding ──────────────────────────────────────────────────────────────────
+def _copy_escape(value) -> str:
+    if value is None:
+        return "\\N"
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+def create_table(cursor, layout: str) -> None:
+    import schema
+    if layout == "partitioned":
+        schema.create_partitioned_table(cursor, BENCH_TABLE)
+        return
+    # Original single-table layout, kept for before/after comparisons
+    cursor.execute("CREATE EXTENSION IF NOT EXISTS vector;")
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {BENCH_TABLE} (
+            id BIGSERIAL PRIMARY KEY,
+            comment TEXT,
+            username TEXT,
+            rating INTEGER,
+            source TEXT,
+            product TEXT,
+            page_timestamp TIMESTAMP,
+            embedding vector({EMBEDDING_DIMENSIONS})
+        );
+    """)
+
+
+def seed_database(backend, args) -> int:
+    """Bulk load the synthetic corpus through a staging table (COPY, then INSERT ... ON CONFLICT DO NOTHING)"""
+    import schema
+    conn = backend.get_db_connection()
+    cursor = conn.cursor()
+    if args.fresh:
+        cursor.execute(f"DROP TABLE IF EXISTS {BENCH_TABLE} CASCADE;")
+        schema._known_partitions.clear()
+    create_table(cursor, args.layout)
+    cursor.execute(f"""
+        CREATE TEMP TABLE bench_staging (
+            comment TEXT, username TEXT, rating INTEGER, source TEXT, product TEXT,
+            page_timestamp TIMESTAMP, embedding vector({EMBEDDING_DIMENSIONS})
+        );
+    """)
+    conn.commit()
+
+    rng = random.Random(args.seed)
+    pool = ["[" + ",".join(f"{rng.uniform(-1, 1):.4f}" for _ in range(EMBEDDING_DIMENSIONS)) + "]" for _ in range(EMBEDDING_POOL_SIZE)]
+    columns = "comment, username, rating, source, product, page_timestamp, embedding"
+    loaded, chunk = 0, []
+
+    def flush():
+        nonlocal loaded
+        if args.layout == "partitioned":
+            schema.ensure_partitions(cursor, BENCH_TABLE, [row[5] for row in chunk])
+        buffer = io.StringIO()
+        for row in chunk:
+            embedding = pool[rng.randrange(EMBEDDING_POOL_SIZE)] if rng.random() < args.seed_embedded_ratio else None
+            buffer.write("\t".join(_copy_escape(value) for value in (*row, embedding)) + "\n")
+        buffer.seek(0)
+        cursor.copy_expert(f"COPY bench_staging ({columns}) FROM STDIN", buffer)
+        cursor.execute(f"INSERT INTO {BENCH_TABLE} ({columns}) SELECT {columns} FROM bench_staging ON CONFLICT DO NOTHING;")
+        loaded += cursor.rowcount
+        cursor.execute("TRUNCATE bench_staging;")
+        conn.commit()
+        chunk.clear()
+
+    start = time.perf_counter()
+    for row in generate_reviews(args.rows, seed=args.seed):
+        chunk.append(row)
+        if len(chunk) >= SEED_CHUNK_ROWS:
+            flush()
+            logger.info("Seeded %d rows", loaded)
+    if chunk:
+        flush()
+    cursor.execute(f"ANALYZE {BENCH_TABLE};")
+    conn.commit()
+    cursor.close()
+    conn.close()
+    logger.warning("Seeded %d rows in %.1fs", loaded, time.perf_counter() - start)
+    return loaded
+
+
+def table_row_count(backend) -> Optional[int]:
+    try:
+        conn = backend.get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT COUNT(*) FROM {BENCH_TABLE};")
+        count = cursor.fetchone()[0]
+        conn.close()
+        return count
+    except Exception:
+        return None
+
+
+# ─── Scenarios ────────────────────────────────────────────────────────────────
+async def bench_ingest(backend, args) -> Dict:
+    rng = random.Random(args.seed + 1)
+    pages = [sample_page(rng, args.page_size) for _ in range(args.requests)]
+
+    async def call(index):
+        await backend.process_comments(backend.CommentData(**pages[index]))
+
+    latencies, wall = await run_timed(call, args.requests, args.concurrency)
+    return summarize(latencies, args.requests * args.page_size, wall, "reviews")
+
+
+async def bench_analyze(backend, args) -> Dict:
+    rng = random.Random(args.seed + 2)
+    pages = [sample_page(rng, args.page_size) for _ in range(args.requests)]
+    analyzed_per_request = min(args.page_size, 6)  # analyze_comments processes the first 6 comments
+
+    async def call(index):
+        await backend.analyze_comments(backend.CommentData(**pages[index]))
+
+    latencies, wall = await run_timed(call, args.requests, args.concurrency)
+    return summarize(latencies, args.requests * analyzed_per_request, wall, "comments")
+
+
+async def bench_embed(backend, args) -> Dict:
+    texts = [row[0] for row in generate_reviews(args.requests, seed=args.seed + 3)]
+
+    async def call(index):
+        await backend.embed(backend.Query(text=texts[index]))
+
+    latencies, wall = await run_timed(call, args.requests, args.concurrency)
+    return summarize(latencies, args.requests, wall, "texts")
+
+
+async def bench_backfill(backend, args) -> Dict:
+    """Null out embeddings on a sample of rows, then time clean_postgresql_data re-embedding them"""
+    latencies = []
+    wall_start = time.perf_counter()
+    for _ in range(args.backfill_runs):
+        conn = backend.get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            f"UPDATE {BENCH_TABLE} SET embedding = NULL WHERE id IN (SELECT id FROM {BENCH_TABLE} ORDER BY random() LIMIT %s);",
+            (args.backfill_rows,)
+        )
+        conn.commit()
+        conn.close()
+        start = time.perf_counter()
+        backend.clean_postgresql_data(BENCH_TABLE)
+        latencies.append(time.perf_counter() - start)
+    wall = time.perf_counter() - wall_start
+    result = summarize(latencies, args.backfill_runs * args.backfill_rows, sum(latencies), "rows")
+    result["wall_seconds_including_reset"] = round(wall, 4)
+    return result
+
+
+BENCHMARKS = {
+    "ingest": bench_ingest,
+    "analyze": bench_analyze,
+    "embed": bench_embed,
+    "backfill": bench_backfill,
+}
+DB_SCENARIOS = {"ingest", "backfill"}
+
+
+# ─── Reporting ────────────────────────────────────────────────────────────────
+def print_report(results: Dict, baseline: Optional[Dict]) -> None:
+    metrics = ("throughput_per_s", "p50_ms", "p95_ms", "p99_ms")
+    print(f"{'scenario':<10} {'metric':<18} {'current':>12} {'baseline':>12} {'change':>9}")
+    for scenario, result in results.items():
+        previous = (baseline or {}).get("results", {}).get(scenario, {})
+        for metric in metrics:
+            current, before = result.get(metric), previous.get(metric)
+            change = f"{(current - before) / before * 100:+.1f}%" if current is not None and before else ""
+            before_text = "" if before is None else f"{before:.3f}"
+            current_text = "" if current is None else f"{current:.3f}"
+            print(f"{scenario:<10} {metric:<18} {current_text:>12} {before_text:>12} {change:>9}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="SpotCheck backend benchmarks")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"Comma separated subset of {SCENARIOS}")
+    parser.add_argument("--rows", type=int, default=10000, help="Synthetic rows to seed before running (0 to reuse the table)")
+    parser.add_argument("--fresh", action="store_true", help="Drop and recreate the benchmark table before seeding")
+    parser.add_argument("--layout", choices=["partitioned", "plain"], default="partitioned")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--seed-embedded-ratio", type=float, default=1.0, help="Share of seeded rows that get a (random) embedding")
+    parser.add_argument("--requests", type=int, default=50, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--page-size", type=int, default=30, help="Reviews per scraped page payload")
+    parser.add_argument("--backfill-runs", type=int, default=3)
+    parser.add_argument("--backfill-rows", type=int, default=200)
+    parser.add_argument("--ollama-latency-ms", type=float, default=DEFAULT_LATENCY_MS)
+    parser.add_argument("--ollama-jitter-ms", type=float, default=DEFAULT_JITTER_MS)
+    parser.add_argument("--ollama-port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--db-host", default="127.0.0.1")
+    parser.add_argument("--db-port", type=int, default=5433)
+    parser.add_argument("--db-name", default="spotcheck_bench")
+    parser.add_argument("--db-user", default="postgres")
+    parser.add_argument("--db-password", default="postgres")
+    parser.add_argument("--allow-remote-db", action="store_true", help="Permit a non-local database host (the run writes to it)")
+    parser.add_argument("--no-db", action="store_true", help="Run without Postgres; only analyze (LLM + encode) and embed are meaningful")
+    parser.add_argument("--baseline", help="Previous results JSON to compare against")
+    parser.add_argument("--output", help="Results JSON path (default benchmarks/results/bench-<timestamp>.json)")
+    parser.add_argument("--log-level", default="WARNING")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(level=args.log_level)
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        sys.exit(f"Unknown scenarios: {sorted(unknown)}")
+    if args.no_db:
+        scenarios = [name for name in scenarios if name not in DB_SCENARIOS]
+    elif args.db_host not in LOCAL_HOSTS and not args.allow_remote_db:
+        sys.exit(f"Refusing to seed and benchmark against non-local host {args.db_host}; pass --allow-remote-db to override")
+
+    fake_ollama = start_fake_ollama(args.ollama_port, args.ollama_latency_ms, args.ollama_jitter_ms)
+    configure_environment(args, fake_ollama.url)
+    backend = load_backend(args.log_level)
+
+    seeded = 0
+    if not args.no_db:
+        if args.rows:
+            seeded = seed_database(backend, args)
+        backend.prepare_review_storage(BENCH_TABLE)
+
+    results = {}
+    for name in scenarios:
+        logger.warning("Running %s", name)
+        results[name] = asyncio.run(BENCHMARKS[name](backend, args))
+    fake_ollama.shutdown()
+
+    report = {
+        "meta": {
+            "started_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seeded_rows": seeded,
+            "table_rows": None if args.no_db else table_row_count(backend),
+            "llm_requests_served": fake_ollama.requests_served,
+            "args": {key: value for key, value in vars(args).items() if key != "db_password"},
+        },
+        "results": results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"bench-{datetime.datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as handle:
+        json.dump(report, handle, indent=2, default=str)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as handle:
+            baseline = json.load(handle)
+    print_report(results, baseline)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()